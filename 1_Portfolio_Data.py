@@ -2,25 +2,23 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from auth_helper import require_login
+from catalog import get_catalog
+from data_quality import ISSUE_TYPES, issue_counts_by_building
+from db_helper import get_usetype_summary
+from emissions import get_district_emissions
+from eui import get_portfolio_eui
+from figure_cache import cached_figure
+from instrumentation import fragment, plotly_chart
+from rollups import data_version, get_enrollment_by_year
+from trends import get_eui_trend, get_wui_trend, water_data_version
+from weather import get_weather_normalized_eui
 
 require_login()
 
 st.title("Portfolio Data")
 
-conn = st.connection("sql", type="sql")
-
 # Get total square footage for each building type
-query = """
-    SELECT 
-        [usetype],
-        COALESCE(SUM(TRY_CAST([sqfootage] AS DECIMAL(10,2))), 0) as total_sqft,
-        COUNT(*) as building_count
-    FROM [dbo].[ESPMFIRSTTEST]
-    GROUP BY [usetype]
-    ORDER BY total_sqft DESC
-"""
-
-df = conn.query(query)
+df = get_usetype_summary()
 
 # Summary stats
 col1, col2 = st.columns(2)
@@ -29,235 +27,322 @@ with col1:
 with col2:
     st.metric("Total Sq Ft", f"{df['total_sqft'].sum():,.0f}")
 
-# Show only top 30 building types in the chart
-top_30 = df.head(30)
+# Figures are built once per data version and shared across sessions (figure_cache.py)
+buildings_version = get_catalog().version
+
 
 # Bar Chart - Top 30 only
-fig_bar = px.bar(
-    top_30,
-    x='total_sqft',
-    y='usetype',
-    orientation='h',
-    color_discrete_sequence=['#1f77b4']
-)
-
-fig_bar.update_layout(
-    height=800,
-    xaxis_title="Total Square Feet",
-    yaxis_title="Building Type",
-    yaxis={'categoryorder': 'total ascending'},
-    showlegend=False,  # COMMA ADDED HERE
-    title = {
-        'text': "District Property by Square Footage",
-        'font': {'size': 20}
-    }
-)
-
-
-st.plotly_chart(fig_bar, use_container_width=True)
+def build_sqft_bar():
+    # Show only top 30 building types in the chart
+    top_30 = df.head(30)
+
+    fig_bar = px.bar(
+        top_30,
+        x='total_sqft',
+        y='usetype',
+        orientation='h',
+        color_discrete_sequence=['#1f77b4']
+    )
+
+    fig_bar.update_layout(
+        height=800,
+        xaxis_title="Total Square Feet",
+        yaxis_title="Building Type",
+        yaxis={'categoryorder': 'total ascending'},
+        showlegend=False,  # COMMA ADDED HERE
+        title = {
+            'text': "District Property by Square Footage",
+            'font': {'size': 20}
+        }
+    )
+    return fig_bar
+
+
+fig_bar = cached_figure("Portfolio", "Property by square footage bar", build_sqft_bar, version=buildings_version)
+plotly_chart(fig_bar, "Property by square footage bar", use_container_width=True)
 
 
 # Pie Chart - Top 10 with more margin for labels
-top_10 = df.head(10)
-
-if len(df) > 10:
-    other_sqft = df.iloc[10:]['total_sqft'].sum()
-    other_count = df.iloc[10:]['building_count'].sum()
-    
-    top_10 = pd.concat([
+def build_usetype_pie():
+    top_10 = df.head(10)
+
+    if len(df) > 10:
+        other_sqft = df.iloc[10:]['total_sqft'].sum()
+        other_count = df.iloc[10:]['building_count'].sum()
+        
+        top_10 = pd.concat([
+            top_10,
+            pd.DataFrame([{
+                'usetype': f'Other ({len(df)-10} types)',
+                'total_sqft': other_sqft,
+                'building_count': other_count
+            }])
+        ])
+
+    fig_pie = px.pie(
         top_10,
-        pd.DataFrame([{
-            'usetype': f'Other ({len(df)-10} types)',
-            'total_sqft': other_sqft,
-            'building_count': other_count
-        }])
-    ])
-
-fig_pie = px.pie(
-    top_10,
-    values='total_sqft',
-    names='usetype',
-    hole=0.3
-)
-
-fig_pie.update_layout(
-    height=700,  
-    margin=dict(t=50, b=150, l=50, r=50),  
-    showlegend=False,
-    title={
-        'text': "Largest Property Types by Square Footage",
-        'font': {'size': 20}
-    }
-)
-
-# Make labels smaller so they fit better
-fig_pie.update_traces(
-    textposition='outside',
-    textinfo='percent+label',
-    textfont_size=12  # Smaller font
-)
-
-st.plotly_chart(fig_pie, use_container_width=True)
-
-# Manually inserted data, not taken from SQL/Energy Star
-buildings_data = {
-    "years": [2018, 2019, 2021, 2022, 2023, 2024, 2025],
-    "buildings": [25, 36, 99, 274, 415, 1154, 1203]
-}
-
-# Create dataframe
-df = pd.DataFrame(buildings_data)
+        values='total_sqft',
+        names='usetype',
+        hole=0.3
+    )
+
+    fig_pie.update_layout(
+        height=700,  
+        margin=dict(t=50, b=150, l=50, r=50),  
+        showlegend=False,
+        title={
+            'text': "Largest Property Types by Square Footage",
+            'font': {'size': 20}
+        }
+    )
+
+    # Make labels smaller so they fit better
+    fig_pie.update_traces(
+        textposition='outside',
+        textinfo='percent+label',
+        textfont_size=12  # Smaller font
+    )
+    return fig_pie
+
+
+fig_pie = cached_figure("Portfolio", "Property types pie", build_usetype_pie, version=buildings_version)
+plotly_chart(fig_pie, "Property types pie", use_container_width=True)
+
+# Buildings and square footage by year, from per-year rollups of the meter data
+enrollment_version = f"{buildings_version}:{data_version()}"
+
 
 # Line graph
-fig = px.line(
-    df,
-    x='years',
-    y='buildings',
-    markers=True
-)
-fig.update_layout(
-    height=500,
-    xaxis_title="Year",
-    yaxis_title="Number of Buildings",
-    title={
-        'text': "Ann Arbor 2030 Buildings By Year",
-        'font': {'size': 20}
-    }
-)
-st.plotly_chart(fig, use_container_width=True)
-
-# Manually inserted data, not taken from SQL/Energy Star
-sqft_data = {
-    "years": [2018, 2019, 2021, 2022, 2023, 2024, 2025],
-    "square_footage": [859321, 1023938, 2597722, 9433543, 20125392, 35212329, 39033537]
-}
-
-# Create dataframe
-df = pd.DataFrame(sqft_data)
+def build_buildings_by_year():
+    df = get_enrollment_by_year()
+    fig = px.line(
+        df,
+        x='years',
+        y='buildings',
+        markers=True
+    )
+    fig.update_layout(
+        height=500,
+        xaxis_title="Year",
+        yaxis_title="Number of Buildings",
+        title={
+            'text': "Ann Arbor 2030 Buildings By Year",
+            'font': {'size': 20}
+        }
+    )
+    return fig
+
+
+fig = cached_figure("Portfolio", "Buildings by year", build_buildings_by_year, version=enrollment_version)
+plotly_chart(fig, "Buildings by year", use_container_width=True)
+
 
 # Line graph
-fig = px.line(
-    df,
-    x='years',
-    y='square_footage',
-    markers=True
-)
-fig.update_layout(
-    height=500,
-    xaxis_title="Year",
-    yaxis_title="Square Footage",
-    title={
-        'text': "Ann Arbor 2030 Square Footage By Year",
-        'font': {'size': 20}
-    }
-)
-st.plotly_chart(fig, use_container_width=True)
-
-# Hardcoded data
-eui_data = {
-    "years": [2018, 2019, 2021, 2022, 2023, 2024],
-    "baseline": [94.5, 78.33, 54.32, 80, 74.14, 64.2],
-    "actual": [113.08, 74.15, 50.91, 79.68, 70.3, 63.3],
-    "target": [64.3, 53.3, 36.9, 54.4, 50.4, 43.7]
-}
-
-# Create dataframe and reshape for Plotly
-df = pd.DataFrame(eui_data)
-df_melted = df.melt(id_vars=['years'], 
-                    value_vars=['baseline', 'actual', 'target'],
-                    var_name=' ', 
-                    value_name='eui')
-
-fig = px.line(
-    df_melted,
-    x='years',
-    y='eui',
-    color=' ',
-    markers=True
-)
-
-fig.update_layout(
-    height=500,
-    xaxis_title="Year",
-    yaxis_title="EUI (kBTU/sq ft)",
-    title={
-        'text': "Energy Use Intensity By Year",
-        'font': {'size': 20}
-    }
-)
-
-st.plotly_chart(fig, use_container_width=True)
-
-wui_data = {
-    "years": [2021, 2022, 2023, 2024],
-    "baseline": [52, 38, 22.4, 30.73],
-    "actual": [42, 33.06, 22.91, 27.04],
-    "target": [35.36, 25.84, 15.23, 20.90]
-}
-
-# Create dataframe and reshape for Plotly
-df = pd.DataFrame(wui_data)
-df_melted = df.melt(id_vars=['years'], 
-                    value_vars=['baseline', 'actual', 'target'],
-                    var_name=' ', 
-                    value_name='wui')
-
-fig = px.line(
-    df_melted,
-    x='years',
-    y='wui',
-    color=' ',
-    markers=True
-)
-
-fig.update_layout(
-    height=500,
-    xaxis_title="Year",
-    yaxis_title="WUI (gal/sq ft)",
-    title={
-        'text': "Water Use Intensity By Year",
-        'font': {'size': 20}
-    }
-)
-# Debugged issue with x-axis tick marks
-fig.update_xaxes(
-    tickmode='array',
-    tickvals=[2021, 2022, 2023, 2024]
-)
-
-st.plotly_chart(fig, use_container_width=True)
-
-emissions_data = {
-    "years": [2018, 2019, 2021, 2022, 2023, 2024],
-    "baseline": [13.44, 16.73, 11.89, 9.4, 7.57, 6.2],
-    "current": [11.66, 13.1, 9.49, 7.5, 6.04, 4.6],
-    "yearly_target": [11.56, 13.89, 9.16, 6.96, 5.37, 3.9],
-    "target_2030": [6.72, 8.37, 5.95, 4.7, 3.79, 3.1]
-}
-
-# Create dataframe and reshape for Plotly
-df = pd.DataFrame(emissions_data)
-df_melted = df.melt(id_vars=['years'], 
-                    value_vars=['baseline', 'current', 'yearly_target', 'target_2030'],
-                    var_name=' ', 
-                    value_name='emissions')
-
-fig = px.line(
-    df_melted,
-    x='years',
-    y='emissions',
-    color=' ',
-    markers=True
-)
-
-fig.update_layout(
-    height=500,
-    xaxis_title="Year",
-    yaxis_title="Emissions (MT CO2e / sq ft)",
-    title={
-        'text': "District Carbon Emissions By Square Foot",
-        'font': {'size': 20}
-    }
-)
-
-st.plotly_chart(fig, use_container_width=True)
+def build_sqft_by_year():
+    df = get_enrollment_by_year()
+    fig = px.line(
+        df,
+        x='years',
+        y='square_footage',
+        markers=True
+    )
+    fig.update_layout(
+        height=500,
+        xaxis_title="Year",
+        yaxis_title="Square Footage",
+        title={
+            'text': "Ann Arbor 2030 Square Footage By Year",
+            'font': {'size': 20}
+        }
+    )
+    return fig
+
+
+fig = cached_figure("Portfolio", "Square footage by year", build_sqft_by_year, version=enrollment_version)
+plotly_chart(fig, "Square footage by year", use_container_width=True)
+
+
+# District EUI and WUI by year, from per-year rollups of the meter and water tables (trends.py)
+def build_eui_by_year():
+    # Reshape for Plotly
+    df = get_eui_trend()
+    df_melted = df.melt(id_vars=['years'], 
+                        value_vars=['baseline', 'actual', 'target'],
+                        var_name=' ', 
+                        value_name='eui')
+
+    fig = px.line(
+        df_melted,
+        x='years',
+        y='eui',
+        color=' ',
+        markers=True
+    )
+
+    fig.update_layout(
+        height=500,
+        xaxis_title="Year",
+        yaxis_title="EUI (kBTU/sq ft)",
+        title={
+            'text': "Energy Use Intensity By Year",
+            'font': {'size': 20}
+        }
+    )
+    # One tick per year, not half years
+    fig.update_xaxes(dtick=1)
+    return fig
+
+
+fig = cached_figure("Portfolio", "EUI by year", build_eui_by_year, version=enrollment_version)
+plotly_chart(fig, "EUI by year", use_container_width=True)
+
+
+def build_wui_by_year():
+    # Reshape for Plotly
+    df = get_wui_trend()
+    df_melted = df.melt(id_vars=['years'], 
+                        value_vars=['baseline', 'actual', 'target'],
+                        var_name=' ', 
+                        value_name='wui')
+
+    fig = px.line(
+        df_melted,
+        x='years',
+        y='wui',
+        color=' ',
+        markers=True
+    )
+
+    fig.update_layout(
+        height=500,
+        xaxis_title="Year",
+        yaxis_title="WUI (gal/sq ft)",
+        title={
+            'text': "Water Use Intensity By Year",
+            'font': {'size': 20}
+        }
+    )
+    # One tick per year, not half years
+    fig.update_xaxes(dtick=1)
+    return fig
+
+
+if get_wui_trend().empty:
+    st.info("No full years of water readings yet: load water meter data into the water table to see WUI by year.")
+else:
+    water_version = f"{buildings_version}:{water_data_version()}"
+    fig = cached_figure("Portfolio", "WUI by year", build_wui_by_year, version=water_version)
+    plotly_chart(fig, "WUI by year", use_container_width=True)
+
+
+# Emissions by year, computed from the meter data with per-year emission factors
+def build_emissions_by_year():
+    # Reshape for Plotly
+    df = get_district_emissions()
+    df_melted = df.melt(id_vars=['years'], 
+                        value_vars=['baseline', 'current', 'yearly_target', 'target_2030'],
+                        var_name=' ', 
+                        value_name='emissions')
+
+    fig = px.line(
+        df_melted,
+        x='years',
+        y='emissions',
+        color=' ',
+        markers=True
+    )
+
+    fig.update_layout(
+        height=500,
+        xaxis_title="Year",
+        yaxis_title="Emissions (MT CO2e / sq ft)",
+        yaxis_tickformat=".4f",
+        title={
+            'text': "District Carbon Emissions By Square Foot",
+            'font': {'size': 20}
+        }
+    )
+    return fig
+
+
+fig = cached_figure("Portfolio", "Emissions by year", build_emissions_by_year, version=enrollment_version)
+plotly_chart(fig, "Emissions by year", use_container_width=True)
+
+# The ranking's filters only rerun the ranking, not the charts above it
+@fragment
+def eui_ranking():
+    # EUI for every building, computed in one pass over calendarized meter data
+    eui_df = get_portfolio_eui()
+    weather_df = get_weather_normalized_eui()
+    if weather_df is not None:
+        eui_df = eui_df.merge(weather_df[['espmid', 'normalized_eui']], on='espmid', how='left')
+
+    st.subheader("Building EUI Ranking")
+
+    selected_usetypes = st.multiselect(
+        "Filter by Building Type:",
+        sorted(eui_df['usetype'].dropna().unique()),
+    )
+    only_above_baseline = st.checkbox("Only show buildings above baseline EUI")
+
+    ranked = eui_df.dropna(subset=['current_eui'])
+    if selected_usetypes:
+        ranked = ranked[ranked['usetype'].isin(selected_usetypes)]
+    if only_above_baseline:
+        ranked = ranked[ranked['eui_gap'] > 0]
+    ranked = ranked.sort_values('eui_gap', ascending=False, na_position='last')
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Buildings With EUI", f"{len(ranked):,}")
+    with col2:
+        st.metric("Above Baseline", f"{(ranked['eui_gap'] > 0).sum():,}")
+
+    columns = ['buildingname', 'usetype', 'latest_year', 'current_eui', 'baseline_eui', 'eui_gap', 'eui_gap_pct']
+    if weather_df is not None:
+        columns.insert(4, 'normalized_eui')
+    st.dataframe(
+        ranked[columns],
+        column_config={
+            'buildingname': "Building",
+            'usetype': "Use Type",
+            'latest_year': st.column_config.NumberColumn("Year", format="%d"),
+            'current_eui': st.column_config.NumberColumn("Current EUI", format="%.1f"),
+            'normalized_eui': st.column_config.NumberColumn("Weather-Normalized EUI", format="%.1f"),
+            'baseline_eui': st.column_config.NumberColumn("Baseline EUI", format="%.1f"),
+            'eui_gap': st.column_config.NumberColumn("Gap (kBTU/sq ft)", format="%+.1f"),
+            'eui_gap_pct': st.column_config.NumberColumn("Gap (%)", format="%+.1f%%"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        height=500
+    )
+
+
+# Buildings whose meter readings have the most data quality issues
+@fragment
+def data_quality_summary():
+    st.subheader("Meter Data Quality")
+    counts = issue_counts_by_building()
+    if counts.empty:
+        st.success("No data quality issues found in the meter readings.")
+        return
+
+    issue_columns = [issue for issue in ISSUE_TYPES if issue in counts.columns]
+    totals = counts[issue_columns].sum()
+    metric_columns = st.columns(len(issue_columns))
+    for column, issue in zip(metric_columns, issue_columns):
+        with column:
+            st.metric(issue, f"{totals[issue]:,}")
+
+    names = get_catalog().buildings.set_index('espmid')['buildingname']
+    worst = counts.head(st.slider("Buildings to show", 10, 200, 25, step=5, key="data_quality_rows"))
+    st.dataframe(
+        worst.assign(buildingname=worst.index.map(names))[['buildingname', 'total'] + issue_columns],
+        column_config={'buildingname': "Building", 'total': "Total Issues"},
+        use_container_width=True
+    )
+
+
+eui_ranking()
+data_quality_summary()
@@ -1,101 +1,191 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 from auth_helper import require_login
+from calendarize import calendarize
+from charts import METER_CHARTS, eui_comparison_bar, stepped_meter_chart
+from catalog import get_building, get_catalog
+from data_quality import issues_for_building
+from db_helper import MAX_COMPARE, get_water_data, search_buildings, split_by_energy_type
+from emissions import get_building_emissions
+from eui import baseline_eui, compute_eui, monthly_kbtu, monthly_kbtu_for, yearly_kbtu
+from figure_cache import cached_figure, frame_version
+from instrumentation import fragment, is_admin, plotly_chart
+from meter_store import get_meter_frames
+from rollups import data_version
+from trends import get_building_water
+from warmup import prefetch_buildings
+from weather import MIN_MONTHS, get_weather_normalized_eui
 
 require_login()
 
 st.title("Building Energy Analysis")
 
-conn = st.connection("sql", type="sql")
-
-# Conversion factors
-KWH_TO_KBTU = 3.412  # 1 kWh = 3.412 kBTU
-THERM_TO_KBTU = 100  # 1 therm = 100 kBTU (also ~1 CCF = 100 kBTU)
-
-# Baseline EUI lookup dictionary (in kBTU/sq ft)
-baseline_eui = {
-    "Adult Education": 60,
-    "Bar/Nightclub": 150,
-    "College/University": 100,
-    "Courthouse": 79,
-    "Distribution Center": 50,
-    "Drinking Water Treatment & Distribution": 300,
-    "Energy/Power Station": 100,
-    "Financial Office": 100,
-    "Fire Station": 79,
-    "Fitness Center/Health Club/Gym": 55,
-    "Heated Swimming Pool": 354,
-    "Hotel": 88,
-    "Ice/Curling Rink": 150,
-    "K-12 School": 80,
-    "Laboratory": 50,
-    "Library": 50,
-    "Manufacturing/Industrial Plant": 50,
-    "Mixed Use Property": 50,
-    "Multifamily Housing": 55,
-    "Museum": 50,
-    "Non-Refrigerated Warehouse": 50,
-    "Office": 80,
-    "Other": 40,
-    "Other - Education": 40,
-    "Other - Entertainment/Public Assembly": 40,
-    "Other - Mall": 40,
-    "Other - Public Services": 40,
-    "Other - Recreation": 50,
-    "Other - Restaurant/Bar": 231,
-    "Other - Technology/Science": 50,
-    "Other - Utility": 50,
-    "Personal Services (Health/Beauty, Dry Cleaning, etc.)": 50,
-    "Residence Hall/Dormitory": 125,
-    "Restaurant": 200,
-    "Retail Store": 105,
-    "Single-Family Home": 39,
-    "Social/Meeting Hall": 100,
-    "Strip Mall": 110,
-    "Transportation Terminal/Station": 150,
-    "Worship Facility": 50
-}
-
-# Get all buildings for dropdown
-buildings_query = """
-    SELECT DISTINCT 
-        [espmid],
-        [buildingname],
-        [usetype],
-        [sqfootage],
-        [address]
-    FROM [dbo].[ESPMFIRSTTEST]
-    WHERE [buildingname] IS NOT NULL
-    AND [espmid] IS NOT NULL
-    ORDER BY [buildingname]
-"""
-
-buildings_df = conn.query(buildings_query)
-
-# Create dropdown with building names
-building_names = buildings_df['buildingname'].tolist()
-selected_building = st.selectbox(
+mode = st.radio("View:", ["Single building", "Compare buildings"], horizontal=True)
+
+# Search on the server and only list the top matches in the dropdown
+search_term = st.text_input(
+    "Search buildings:",
+    placeholder="Building name, address or ESPM ID",
+    help="Press Enter to search; the dropdown shows the best matches"
+)
+matches = search_buildings(search_term)
+
+
+def building_label(espmid):
+    building = get_catalog().get(espmid)
+    if building is None:
+        return espmid
+    if pd.notna(building['address']):
+        return f"{building['buildingname']} — {building['address']}"
+    return building['buildingname']
+
+
+# Widgets in the comparison only rerun the comparison, not the search above it
+@fragment
+def comparison_view(matches):
+    catalog = get_catalog()
+    selection = st.session_state.setdefault("compare_espmids", [])
+
+    # Quick-select every building of one use type
+    group_col, add_col = st.columns([3, 1])
+    with group_col:
+        group_usetype = st.selectbox("Use type group:", catalog.usetypes(), index=None, placeholder="Pick a use type")
+    with add_col:
+        st.write("")
+        # Set in a callback so the multiselect below already shows the group on this run
+        st.button(
+            "Compare this group",
+            disabled=group_usetype is None,
+            on_click=lambda: st.session_state.update(compare_espmids=catalog.usetype_group(group_usetype)[:MAX_COMPARE])
+        )
+
+    # Options are the current selection plus the search matches, so the list stays short
+    options = list(dict.fromkeys(selection + matches['espmid'].tolist()))
+    selected_espmids = st.multiselect(
+        "Buildings to compare:",
+        options,
+        key="compare_espmids",
+        format_func=building_label,
+        max_selections=MAX_COMPARE,
+        help="Search above to find more buildings to add"
+    )
+    if len(selected_espmids) < 2:
+        st.info("Select at least two buildings to compare.")
+        return
+
+    # One query for every selected building and meter table
+    compare_kbtu = monthly_kbtu_for(selected_espmids)
+    labels = {espmid: building_label(espmid) for espmid in selected_espmids}
+
+    # Cached figures are keyed on the selection and the portfolio's meter data version
+    selection_key = tuple(sorted(selected_espmids))
+    compare_version = f"{get_catalog().version}:{data_version()}"
+
+    # Monthly net energy use, overlaid
+    st.write("### Monthly Energy Use")
+    if compare_kbtu.empty:
+        st.info("No meter data found for the selected buildings.")
+    else:
+        def build_monthly():
+            monthly = (
+                compare_kbtu.assign(building=compare_kbtu['espmid'].map(labels))
+                .groupby(['building', 'month'], as_index=False)['kbtu'].sum()
+            )
+            fig_monthly = px.line(
+                monthly,
+                x='month',
+                y='kbtu',
+                color='building',
+                title="Net Monthly Energy Use (kBTU)"
+            )
+            fig_monthly.update_layout(xaxis_title="Month", yaxis_title="kBTU", legend_title="Building")
+            return fig_monthly
+
+        fig_monthly = cached_figure(
+            "Building comparison", "Comparison monthly chart", build_monthly,
+            espmid=selection_key, version=compare_version
+        )
+        plotly_chart(fig_monthly, "Comparison monthly chart", use_container_width=True)
+
+    # Latest-year EUI against each building's benchmark
+    st.write("### EUI Comparison")
+    buildings = pd.DataFrame([catalog.get(espmid) for espmid in selected_espmids if catalog.get(espmid)])
+    compare_eui = compute_eui(buildings, yearly_kbtu(compare_kbtu))
+    compare_eui['building'] = compare_eui['espmid'].map(labels)
+    with_eui = compare_eui.dropna(subset=['current_eui']).sort_values('current_eui', ascending=False)
+    if with_eui.empty:
+        st.info("None of the selected buildings has enough data to calculate EUI.")
+    else:
+        def build_eui():
+            fig_eui = px.bar(
+                with_eui,
+                x='building',
+                y='current_eui',
+                hover_data=['usetype', 'latest_year'],
+                title="Energy Use Intensity vs Baseline (kBTU/sq ft)"
+            )
+            fig_eui.add_scatter(
+                x=with_eui['building'],
+                y=with_eui['baseline_eui'],
+                mode='markers',
+                marker=dict(symbol='line-ew-open', size=24, line=dict(width=3)),
+                name='Baseline EUI'
+            )
+            fig_eui.update_layout(xaxis_title="", yaxis_title="kBTU/sq ft", showlegend=True)
+            return fig_eui
+
+        fig_eui = cached_figure(
+            "Building comparison", "Comparison EUI chart", build_eui,
+            espmid=selection_key, version=compare_version
+        )
+        plotly_chart(fig_eui, "Comparison EUI chart", use_container_width=True)
+
+    st.dataframe(
+        compare_eui[['building', 'usetype', 'sqft', 'latest_year', 'current_eui', 'baseline_eui', 'eui_gap_pct']],
+        column_config={
+            'building': "Building",
+            'usetype': "Use Type",
+            'sqft': st.column_config.NumberColumn("Sq Ft", format="%d"),
+            'latest_year': st.column_config.NumberColumn("Year", format="%d"),
+            'current_eui': st.column_config.NumberColumn("EUI", format="%.1f"),
+            'baseline_eui': st.column_config.NumberColumn("Baseline EUI", format="%.1f"),
+            'eui_gap_pct': st.column_config.NumberColumn("Gap vs Baseline (%)", format="%+.1f"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+if mode == "Compare buildings":
+    comparison_view(matches)
+    st.stop()
+
+if matches.empty:
+    st.info(f"No buildings match '{search_term}'.")
+    st.stop()
+
+match_labels = {espmid: building_label(espmid) for espmid in matches['espmid']}
+selected_espmid = st.selectbox(
     "Select a Building:",
-    building_names,
+    list(match_labels),
     index=0,
-    help="Start typing to search through 867 buildings"
+    format_func=match_labels.get
 )
 
-# Get building info
-selected_espmid = buildings_df.loc[
-    buildings_df['buildingname'] == selected_building, 'espmid'
-].iloc[0]
-building_info = buildings_df.loc[buildings_df['buildingname'] == selected_building].iloc[0]
+# Get building info from the shared catalog
+building_info = get_building(selected_espmid)
+if building_info is None:
+    st.info(f"Building {selected_espmid} is not in the building list yet. Try again in a few minutes.")
+    st.stop()
 
 # Display building info
 building_info_df = pd.DataFrame({
     'Attribute': ['Address', 'Use Type', 'Square Footage', 'ESPM ID'],
     'Value': [
-        str(building_info.get('address', 'Not Available')) if pd.notna(building_info.get('address')) else 'Not Available',
+        str(building_info['address']) if pd.notna(building_info['address']) else 'Not Available',
         str(building_info['usetype']) if pd.notna(building_info['usetype']) else 'Not Available',
-        f"{float(building_info['sqfootage']):,.0f}" if pd.notna(building_info['sqfootage']) and str(building_info['sqfootage']).replace('.', '').isdigit() else str(building_info['sqfootage']) if pd.notna(building_info['sqfootage']) else 'Not Available',
+        f"{building_info['sqft']:,.0f}" if pd.notna(building_info['sqft']) else str(building_info['sqfootage']) if pd.notna(building_info['sqfootage']) else 'Not Available',
         selected_espmid
     ]
 })
@@ -103,237 +193,195 @@ building_info_df = pd.DataFrame({
 # Display as a small, clean table
 st.table(building_info_df.set_index('Attribute'))
 
+# Flag meter readings that may distort the numbers below
+building_issues = issues_for_building(selected_espmid)
+if not building_issues.empty:
+    st.warning(f"⚠️ {len(building_issues):,} data quality issues in this building's meter readings")
+    with st.expander("Data quality issues"):
+        st.dataframe(
+            building_issues[['energy_type', 'meterid', 'startdate', 'enddate', 'issue', 'detail']],
+            column_config={
+                'energy_type': "Energy Type",
+                'meterid': "Meter",
+                'startdate': st.column_config.DateColumn("Start Date", format="YYYY-MM-DD"),
+                'enddate': st.column_config.DateColumn("End Date", format="YYYY-MM-DD"),
+                'issue': "Issue",
+                'detail': "Detail",
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
 # Get baseline EUI
 building_use_type = str(building_info['usetype']) if pd.notna(building_info['usetype']) else ""
 baseline_eui_value = baseline_eui.get(building_use_type, None)
 
-# Function to get meter data
-def get_meter_data(table_name, espmid, energy_type):
-    query = f"""
-        SELECT 
-            [entryid],
-            [meterid],
-            TRY_CAST([usage] AS FLOAT) as usage,
-            [startdate],
-            [enddate]
-        FROM [dbo].[{table_name}]
-        WHERE [espmid] = '{espmid}'
-        ORDER BY [startdate]
-    """
-    df = conn.query(query)
-    if not df.empty:
-        df['energy_type'] = energy_type
-        df['startdate'] = pd.to_datetime(df['startdate'])
-        df['enddate'] = pd.to_datetime(df['enddate'])
-        df['year'] = df['startdate'].dt.year
-    else:
-        # Create empty dataframe WITH the 'year' column
-        df = pd.DataFrame(columns=['entryid', 'meterid', 'usage', 'startdate', 'enddate', 'energy_type', 'year'])
-    
-    return df
+# Meter rows from all meter tables, shared with other sessions viewing this building
+all_meter_data, meter_frames = get_meter_frames(selected_espmid)
+# and start loading the buildings likely to be picked next
+prefetch_buildings(selected_espmid, list(match_labels))
 
-# Then after getting the data, ensure all dataframes have 'year' column
-# Get data from all tables
-electric_df = get_meter_data('electric', selected_espmid, 'Electric')
-gas_df = get_meter_data('naturalgas', selected_espmid, 'Natural Gas')
-solar_df = get_meter_data('solar', selected_espmid, 'Solar')
+# 1. Calculate EUI for MOST RECENT YEAR ONLY
+building_monthly = monthly_kbtu(calendarize(all_meter_data.assign(espmid=selected_espmid)))
+building_eui = compute_eui(pd.DataFrame([building_info]), yearly_kbtu(building_monthly)).iloc[0]
 
-# Combine all data for display
-all_meter_data = pd.concat([electric_df, gas_df, solar_df], ignore_index=True)
+if pd.notna(building_info['sqfootage']) and pd.isna(building_eui['sqft']):
+    st.info(f"Cannot calculate EUI: square footage '{building_info['sqfootage']}' is not a number")
+elif pd.notna(building_eui['current_eui']):
+    current_eui = building_eui['current_eui']
+    latest_year = int(building_eui['latest_year'])
 
-# 1. Calculate EUI for MOST RECENT YEAR ONLY
-if pd.notna(building_info['sqfootage']):
-    try:
-        sqft_value = float(building_info['sqfootage'])
+    # Show which year we're using
+    st.write(f"**Calculating EUI for {latest_year}**")
+
+    # Weather-normalized EUI, when a degree-day file is configured
+    normalized_eui = None
+    weather_df = get_weather_normalized_eui()
+    if weather_df is None:
+        # Only admins can set it up
+        if is_admin():
+            st.caption("Set [weather] degree_days in secrets.toml to a degree-day CSV to see weather-normalized EUI.")
+    else:
+        weather = weather_df.set_index('espmid').reindex([selected_espmid]).iloc[0]
+        normalized_eui = weather['normalized_eui']
+        billed_months = building_monthly['month'].nunique()
+        if pd.notna(normalized_eui):
+            st.write(
+                f"Weather-normalized EUI ({latest_year}): **{normalized_eui:.1f} kBTU/sq ft** "
+                f"(fit on {weather['months']:.0f} months, R² {weather['r2']:.2f})"
+            )
+        elif billed_months < MIN_MONTHS:
+            st.caption(f"Weather normalization needs at least {MIN_MONTHS} months of bills; "
+                       f"this building has {billed_months}.")
+        elif pd.isna(weather['months']):
+            st.caption(f"Fewer than {MIN_MONTHS} of this building's billed months have degree-day data, "
+                       "so its EUI can't be weather-normalized.")
+        else:
+            st.caption(f"There is no full year of degree-day data for {latest_year}, "
+                       "so its EUI can't be weather-normalized.")
+
+    # Bar chart comparing current vs baseline
+    if baseline_eui_value:
+        st.write("### EUI Comparison")
+        fig_bar = cached_figure(
+            "Building", "EUI comparison bar",
+            lambda: eui_comparison_bar(current_eui, baseline_eui_value, latest_year, normalized_eui),
+            espmid=selected_espmid, version=f"{latest_year}:{current_eui}:{baseline_eui_value}:{normalized_eui}"
+        )
+        plotly_chart(fig_bar, "EUI comparison bar", use_container_width=True)
         
-        if not all_meter_data.empty:
-            # Find the most recent year with data
-            years_with_data = sorted(all_meter_data['year'].unique())
-            
-            if years_with_data:
-                latest_year = years_with_data[-1]
-                
-                # Calculate total kBTU for the most recent year only
-                total_kbtu = 0
-                
-                # Electric for most recent year - ONLY if not empty
-                if not electric_df.empty:
-                    electric_recent = electric_df[electric_df['year'] == latest_year]
-                    if not electric_recent.empty and 'usage' in electric_recent.columns:
-                        electric_kwh = electric_recent['usage'].sum()
-                        total_kbtu += electric_kwh * KWH_TO_KBTU
-                
-                # Natural Gas for most recent year - ONLY if not empty  
-                if not gas_df.empty:
-                    gas_recent = gas_df[gas_df['year'] == latest_year]
-                    if not gas_recent.empty and 'usage' in gas_recent.columns:
-                        gas_therms = gas_recent['usage'].sum()
-                        total_kbtu += gas_therms * THERM_TO_KBTU
-                
-                # Solar for most recent year - ONLY if not empty
-                if not solar_df.empty:
-                    solar_recent = solar_df[solar_df['year'] == latest_year]
-                    if not solar_recent.empty and 'usage' in solar_recent.columns:
-                        solar_kwh = solar_recent['usage'].sum()
-                        total_kbtu -= solar_kwh * KWH_TO_KBTU
-                        latest_year = years_with_data[-1]
-                
-                # Calculate total kBTU for the most recent year only
-                total_kbtu = 0
-
-                # Electric for most recent year
-                electric_recent = electric_df[electric_df['year'] == latest_year]
-                if not electric_recent.empty and 'usage' in electric_recent.columns:
-                    electric_kwh = electric_recent['usage'].sum()
-                    total_kbtu += electric_kwh * KWH_TO_KBTU
-                
-                # Natural Gas for most recent year
-                gas_recent = gas_df[gas_df['year'] == latest_year]
-                if not gas_recent.empty and 'usage' in gas_recent.columns:
-                    gas_therms = gas_recent['usage'].sum()
-                    total_kbtu += gas_therms * THERM_TO_KBTU
-                
-                # Solar for most recent year (subtract since it reduces energy use)
-                solar_recent = solar_df[solar_df['year'] == latest_year]
-                if not solar_recent.empty and 'usage' in solar_recent.columns:
-                    solar_kwh = solar_recent['usage'].sum()
-                    total_kbtu -= solar_kwh * KWH_TO_KBTU
-                
-                # Calculate EUI for most recent year
-                if sqft_value > 0 and total_kbtu > 0:
-                    current_eui = total_kbtu / sqft_value
-                    
-                    # Show which year we're using
-                    st.write(f"**Calculating EUI for {latest_year}**")
-                    
-                    # Bar chart comparing current vs baseline
-                    if baseline_eui_value:
-                        st.write("### EUI Comparison")
-                        comparison_df = pd.DataFrame({
-                            'Metric': ['Current EUI', 'Baseline EUI'],
-                            'Value': [current_eui, baseline_eui_value],
-                            'Year': [f'{latest_year}', 'Benchmark']
-                        })
-                        
-                        fig_bar = px.bar(
-                            comparison_df,
-                            x='Metric',
-                            y='Value',
-                            color='Metric',
-                            text='Value',
-                            title=f"Energy Use Intensity Comparison (kBTU/sq ft)"
-                        )
-                        fig_bar.update_traces(texttemplate='%{y:.1f}', textposition='outside')
-                        fig_bar.update_layout(
-                            showlegend=False, 
-                            yaxis_title="kBTU/sq ft",
-                            xaxis_title=f"Most Recent Year: {latest_year}"
-                        )
-                        st.plotly_chart(fig_bar, use_container_width=True)
-                        
-                        # Show the difference
-                        diff = current_eui - baseline_eui_value
-                        diff_pct = (diff / baseline_eui_value * 100) if baseline_eui_value > 0 else 0
-                        
-                        if diff > 0:
-                            st.warning(f"⚠️ Current EUI is **{diff:.1f} kBTU/sq ft higher** than baseline ({diff_pct:+.1f}%)")
-                        else:
-                            st.success(f"✅ Current EUI is **{abs(diff):.1f} kBTU/sq ft lower** than baseline ({diff_pct:+.1f}%)")
-                        
-                    else:
-                        st.info(f"Current EUI ({latest_year}): **{current_eui:.1f} kBTU/sq ft**")
-                        st.warning("No baseline EUI available for this building type.")
-                    
-    except (ValueError, TypeError) as e:
-        st.info(f"Cannot calculate EUI: {e}")
-
-# 2. Stepped line graphs for each energy type
-
-# Electric stepped line graph
-if not electric_df.empty:
-    electric_sorted = electric_df.sort_values('startdate')
-    
-    fig_electric = go.Figure()
-    fig_electric.add_trace(go.Scatter(
-        x=electric_sorted['startdate'],
-        y=electric_sorted['usage'],
-        mode='lines',
-        line=dict(shape='hv'),
-        name='Electric Usage',
-        fill='tozeroy'
-    ))
-    
-    fig_electric.update_layout(
-        title="Electric Meter Data Over Time",
-        xaxis_title="Date",
-        yaxis_title="Usage (kWh)",
-        height=400
-    )
-    st.plotly_chart(fig_electric, use_container_width=True)
-
-# Natural Gas stepped line graph
-if not gas_df.empty:
-    gas_sorted = gas_df.sort_values('startdate')
-    
-    fig_gas = go.Figure()
-    fig_gas.add_trace(go.Scatter(
-        x=gas_sorted['startdate'],
-        y=gas_sorted['usage'],
-        mode='lines',
-        line=dict(shape='hv'),
-        name='Natural Gas Usage',
-        fill='tozeroy'
-    ))
-    
-    fig_gas.update_layout(
-        title="Natural Gas Meter Data Over Time",
-        xaxis_title="Date",
-        yaxis_title="Usage (therms/CCF)",
-        height=400
-    )
-    st.plotly_chart(fig_gas, use_container_width=True)
-
-# Solar stepped line graph
-if not solar_df.empty:
-    solar_sorted = solar_df.sort_values('startdate')
-    
-    fig_solar = go.Figure()
-    fig_solar.add_trace(go.Scatter(
-        x=solar_sorted['startdate'],
-        y=solar_sorted['usage'],
-        mode='lines',
-        line=dict(shape='hv'),
-        name='Solar Generation',
-        fill='tozeroy'
-    ))
-    
-    fig_solar.update_layout(
-        title="Solar Meter Data Over Time",
-        xaxis_title="Date",
-        yaxis_title="Generation (kWh)",
-        height=400
-    )
-    st.plotly_chart(fig_solar, use_container_width=True)
-
-# 3. Combined meter data table
-st.subheader("📋 All Meter Data")
-if not all_meter_data.empty:
-    # Sort by date
-    all_meter_data = all_meter_data.sort_values('startdate')
-    
-    # Format dates for display
-    display_df = all_meter_data.copy()
-    display_df['startdate'] = display_df['startdate'].dt.strftime('%Y-%m-%d')
-    display_df['enddate'] = display_df['enddate'].dt.strftime('%Y-%m-%d')
-    
-    # Display columns
-    display_cols = ['energy_type', 'meterid', 'usage', 'startdate', 'enddate']
-    st.dataframe(display_df[display_cols], 
-                 use_container_width=True, 
-                 height=400)
-    
-    # Summary
-    st.write(f"**Total Records:** {len(all_meter_data)}")
-    
+        # Show the difference
+        diff = building_eui['eui_gap']
+        diff_pct = building_eui['eui_gap_pct'] if baseline_eui_value > 0 else 0
+        
+        if diff > 0:
+            st.warning(f"⚠️ Current EUI is **{diff:.1f} kBTU/sq ft higher** than baseline ({diff_pct:+.1f}%)")
+        else:
+            st.success(f"✅ Current EUI is **{abs(diff):.1f} kBTU/sq ft lower** than baseline ({diff_pct:+.1f}%)")
+        
+    else:
+        st.info(f"Current EUI ({latest_year}): **{current_eui:.1f} kBTU/sq ft**")
+        st.warning("No baseline EUI available for this building type.")
+
+# Carbon emissions for the latest full year of readings (or the latest year if none is full)
+emissions_df = get_building_emissions()
+emissions_df = emissions_df[emissions_df['espmid'] == selected_espmid]
+if not emissions_df.empty:
+    full_years = emissions_df[emissions_df['months'] == 12]
+    emissions = (full_years if not full_years.empty else emissions_df).sort_values('year').iloc[-1]
+    per_sqft = (f", {emissions['emissions_mt'] / emissions['sqft']:.4f} MT CO2e/sq ft"
+                if emissions['sqft'] > 0 else "")
+    st.write(f"**Carbon emissions ({emissions['year']:.0f}):** {emissions['emissions_mt']:,.1f} MT CO2e{per_sqft}")
+    if pd.notna(emissions['baseline_mt']):
+        st.write(
+            f"Baseline ({emissions['baseline_year']:.0f}): {emissions['baseline_mt']:,.1f} MT CO2e · "
+            f"{emissions['year']:.0f} target: {emissions['yearly_target_mt']:,.1f} · "
+            f"2030 target: {emissions['target_2030_mt']:,.1f}"
+        )
+
+# 2 and 3. Meter charts and the full meter table. Only the picked view is built,
+# and changing the view or the date range reruns just this part of the page.
+@fragment
+def meter_views(espmid, all_meter_data, meter_frames):
+    if all_meter_data.empty:
+        st.info("No meter data found for this building.")
+        return
+
+    view = st.radio("Show:", ["Meter charts", "All meter data"], horizontal=True, key="building_meter_view")
+
+    if view == "Meter charts":
+        # Long series are summed to daily/monthly/yearly totals so each chart stays small;
+        # narrowing the date range brings back full resolution.
+        first_date = all_meter_data['startdate'].min().date()
+        last_date = all_meter_data['startdate'].max().date()
+        date_range = st.date_input(
+            "Chart date range:",
+            value=(first_date, last_date),
+            min_value=first_date,
+            max_value=last_date,
+            help="Narrow the range to see meter readings at full resolution"
+        )
+        if len(date_range) == 2:
+            in_range = all_meter_data['startdate'].between(
+                pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]) + pd.Timedelta(days=1),
+                inclusive='left'
+            )
+            chart_frames = split_by_energy_type(all_meter_data[in_range])
+        else:
+            chart_frames = meter_frames
+        chart_version = f"{frame_version(all_meter_data)}:{date_range}"
+
+        # Stepped line graph for each energy type
+        for energy_type, chart_name, title, yaxis_title, trace_name in METER_CHARTS:
+            if chart_frames[energy_type].empty:
+                continue
+            fig = cached_figure(
+                "Building", chart_name,
+                lambda: stepped_meter_chart(chart_frames[energy_type], title, yaxis_title, trace_name),
+                espmid=espmid, version=chart_version
+            )
+            plotly_chart(fig, chart_name, use_container_width=True)
+
+    else:
+        st.subheader("📋 All Meter Data")
+
+        # Dates are formatted by the table, not copied into strings
+        display_cols = ['energy_type', 'meterid', 'usage', 'startdate', 'enddate']
+        st.dataframe(all_meter_data.sort_values('startdate')[display_cols],
+                     column_config={
+                         'usage': st.column_config.NumberColumn("usage", format="%.2f"),
+                         'startdate': st.column_config.DateColumn("startdate", format="YYYY-MM-DD"),
+                         'enddate': st.column_config.DateColumn("enddate", format="YYYY-MM-DD"),
+                     },
+                     use_container_width=True,
+                     height=400)
+
+        # Summary
+        st.write(f"**Total Records:** {len(all_meter_data)}")
+
+
+meter_views(selected_espmid, all_meter_data, meter_frames)
+
+
+# Water meter readings and the latest full year's water use intensity
+st.subheader("💧 Water Meter Data")
+water_data = get_water_data(selected_espmid)
+if water_data.empty:
+    st.info("No water meter data found for this building.")
 else:
-    st.info("No meter data found for this building.")
\ No newline at end of file
+    water_df = get_building_water()
+    water_df = water_df[(water_df['espmid'] == selected_espmid) & (water_df['months'] == 12)]
+    if not water_df.empty:
+        water = water_df.iloc[-1]
+        wui = f", {water['wui']:.1f} gal/sq ft" if pd.notna(water['wui']) else ""
+        st.write(f"**Water use ({water['year']:.0f}):** {water['use']:,.0f} gal{wui}")
+
+    st.dataframe(water_data[['meterid', 'usage', 'startdate', 'enddate']],
+                 column_config={
+                     'usage': st.column_config.NumberColumn("usage (gal)", format="%.0f"),
+                     'startdate': st.column_config.DateColumn("startdate", format="YYYY-MM-DD"),
+                     'enddate': st.column_config.DateColumn("enddate", format="YYYY-MM-DD"),
+                 },
+                 use_container_width=True,
+                 height=300)
+    st.write(f"**Total Records:** {len(water_data)}")
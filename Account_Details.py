@@ -1,13 +1,65 @@
 import streamlit as st
 from auth_helper import require_login
+from db_helper import (
+    ACCOUNT_COLUMNS, ACCOUNT_PAGE_SIZE, ACCOUNT_SORT_COLUMNS,
+    count_account_buildings, get_account_page, get_usetype_summary
+)
 
 require_login()
 st.title("Account Details")
 st.write("Home page content here.")
 
-conn = st.connection("sql", type="sql")
+# Filters and sorting are applied in SQL, so only one page of rows is fetched
+col1, col2 = st.columns(2)
+with col1:
+    name_search = st.text_input("Search by building name:")
+    usetypes = st.multiselect("Use type:", get_usetype_summary()['usetype'].dropna().tolist())
+with col2:
+    sqft_col1, sqft_col2 = st.columns(2)
+    with sqft_col1:
+        min_sqft = st.number_input("Min sq ft:", min_value=0, value=0, step=1000)
+    with sqft_col2:
+        max_sqft = st.number_input("Max sq ft (0 = no limit):", min_value=0, value=0, step=1000)
+    sort_col1, sort_col2 = st.columns(2)
+    with sort_col1:
+        sort_column = st.selectbox(
+            "Sort by:", list(ACCOUNT_SORT_COLUMNS), format_func=ACCOUNT_SORT_COLUMNS.get
+        )
+    with sort_col2:
+        descending = st.toggle("Descending")
 
-# excluded espmid, 865 entries for total portfolio in 
-df = conn.query("SELECT TOP (1000) [buildingname],[sqfootage],[address],[usetype], [occupancy], [numbuildings] FROM [dbo].[ESPMFIRSTTEST];")
+filters = dict(usetypes=tuple(usetypes), min_sqft=min_sqft, max_sqft=max_sqft, name_search=name_search)
 
-st.dataframe(df, height = 1000)
\ No newline at end of file
+# Keyset cursors: the (sort_key, espmid) each page starts after. Start over when
+# the filters or sort order change.
+view = (tuple(filters.items()), sort_column, descending)
+if st.session_state.get("account_view") != view:
+    st.session_state.account_view = view
+    st.session_state.account_cursors = [None]
+
+cursors = st.session_state.account_cursors
+page = get_account_page(sort_column, descending, after=cursors[-1], **filters)
+has_next = len(page) > ACCOUNT_PAGE_SIZE
+page = page.head(ACCOUNT_PAGE_SIZE)
+
+
+def next_page():
+    last = page.iloc[-1]
+    cursors.append((last['sort_key'], last['espmid']))
+
+
+def previous_page():
+    cursors.pop()
+
+
+st.dataframe(page[ACCOUNT_COLUMNS], height=1000, hide_index=True)
+
+total = count_account_buildings(**filters)
+page_count = max(1, -(-total // ACCOUNT_PAGE_SIZE))
+col1, col2, col3 = st.columns([1, 2, 1])
+with col1:
+    st.button("← Previous", on_click=previous_page, disabled=len(cursors) == 1)
+with col2:
+    st.write(f"Page {len(cursors)} of {page_count} ({total:,} buildings)")
+with col3:
+    st.button("Next →", on_click=next_page, disabled=not has_next)
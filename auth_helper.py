@@ -19,6 +19,7 @@ def require_login():
     if st.button("Login"):
         if username == VALID_USER and password == VALID_PASS:
             st.session_state.logged_in = True
+            st.session_state.username = username
             st.rerun()  # or st.experimental_rerun on older versions
         else:
             st.error("Incorrect username or password")
@@ -0,0 +1,190 @@
+# benchmark.py
+# Runs every page headlessly with Streamlit's AppTest against synthetic SQLite
+# databases of increasing size and reports where the time and memory go.
+#
+#   python benchmark.py                         # 1k, 10k and 100k buildings
+#   python benchmark.py --scales 1000 5000 --json bench.json
+#
+# Each scale runs in its own process, so peak memory and caches don't leak
+# between scales. For every page the cold run starts with empty Streamlit caches
+# and the warm run repeats it straight after.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES = ["Account_Details.py", "1_Portfolio_Data.py", "2_Building_Data.py"]
+DEFAULT_SCALES = [1_000, 10_000, 100_000]
+PAGE_TIMEOUT = 600  # seconds a single page run may take
+
+SECRETS_TEMPLATE = """[auth]
+username = "benchmark"
+password = "benchmark"
+
+[connections.sql]
+url = "sqlite:///{db_path}"
+"""
+
+
+# Wrap the database reads and Plotly figure construction with timers
+def _install_timers(timings):
+    import plotly.basedatatypes
+    import plotly.express._chart_types
+    import db_helper
+
+    read_sql = db_helper.read_sql
+
+    def timed_read_sql(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return read_sql(*args, **kwargs)
+        finally:
+            timings["query"] += time.perf_counter() - start
+            timings["queries"] += 1
+
+    db_helper.read_sql = timed_read_sql
+
+    depth = [0]  # px builds figures from figures, only time the outermost call
+
+    def timed(build, count):
+        def timed_build(*args, **kwargs):
+            depth[0] += 1
+            start = time.perf_counter()
+            try:
+                return build(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                if depth[0] == 0:
+                    timings["figure"] += time.perf_counter() - start
+                    timings["figures"] += count
+        return timed_build
+
+    # Every px chart function goes through make_figure; go figures through BaseFigure
+    plotly.express._chart_types.make_figure = timed(plotly.express._chart_types.make_figure, 1)
+    plotly.basedatatypes.BaseFigure.__init__ = timed(plotly.basedatatypes.BaseFigure.__init__, 1)
+    plotly.basedatatypes.BaseFigure.update_layout = timed(plotly.basedatatypes.BaseFigure.update_layout, 0)
+    plotly.basedatatypes.BaseFigure.update_traces = timed(plotly.basedatatypes.BaseFigure.update_traces, 0)
+
+
+def _run_page(page, timings, trace_memory=False):
+    from streamlit.testing.v1 import AppTest
+
+    for key in timings:
+        timings[key] = 0
+    at = AppTest.from_file(os.path.join(REPO_DIR, page), default_timeout=PAGE_TIMEOUT)
+    at.session_state["logged_in"] = True
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    at.run()
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].message}")
+    return {
+        "total_s": total,
+        "query_s": timings["query"],
+        "figure_s": timings["figure"],
+        # Whatever is not the database or Plotly: pandas work plus Streamlit itself
+        "pandas_other_s": total - timings["query"] - timings["figure"],
+        "queries": timings["queries"],
+        "figures": timings["figures"],
+        "peak_mb": peak / 1e6 if peak is not None else None,
+    }
+
+
+# Runs inside the per-scale process, with the working directory holding secrets.toml
+def run_worker():
+    import streamlit as st
+
+    sys.path.insert(0, REPO_DIR)
+    timings = {"query": 0.0, "figure": 0.0, "queries": 0, "figures": 0}
+    _install_timers(timings)
+
+    results = []
+    for page in PAGES:
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        cold = _run_page(page, timings)
+        warm = _run_page(page, timings)
+
+        # Separate cold pass for memory, since tracemalloc slows everything down
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        cold["peak_mb"] = _run_page(page, timings, trace_memory=True)["peak_mb"]
+
+        results.append({"page": page, "cold": cold, "warm": warm})
+    print(json.dumps(results))
+
+
+# Synthetic database and secrets.toml for one scale; returns the folder to run in
+def prepare_scale(n_buildings, years, workdir, regenerate):
+    import synthetic_data
+
+    scale_dir = os.path.join(workdir, f"scale_{n_buildings}")
+    db_path = os.path.abspath(os.path.join(workdir, f"bench_{n_buildings}.db"))
+    if regenerate or not os.path.exists(db_path):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        print(f"Generating {n_buildings:,} buildings...", file=sys.stderr)
+        synthetic_data.generate(f"sqlite:///{db_path}", n_buildings, years)
+
+    os.makedirs(os.path.join(scale_dir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(scale_dir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(SECRETS_TEMPLATE.format(db_path=db_path))
+    return scale_dir
+
+
+def run_scale(n_buildings, years, workdir, regenerate):
+    scale_dir = prepare_scale(n_buildings, years, workdir, regenerate)
+    print(f"Benchmarking {n_buildings:,} buildings...", file=sys.stderr)
+    worker = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker"],
+        cwd=scale_dir, capture_output=True, text=True,
+    )
+    if worker.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed at {n_buildings:,} buildings:\n{worker.stderr[-2000:]}")
+    return json.loads(worker.stdout.strip().splitlines()[-1])
+
+
+def print_report(report):
+    header = f"{'buildings':>10}  {'page':<20} {'run':<5} {'total s':>8} {'query s':>8} {'figure s':>9} {'pandas/other s':>15} {'queries':>8} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for n_buildings, results in report.items():
+        for result in results:
+            for run in ("cold", "warm"):
+                r = result[run]
+                peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else ""
+                print(f"{n_buildings:>10,}  {result['page']:<20} {run:<5} {r['total_s']:>8.2f} {r['query_s']:>8.2f} "
+                      f"{r['figure_s']:>9.2f} {r['pandas_other_s']:>15.2f} {r['queries']:>8} {peak:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every page against synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="building counts to test")
+    parser.add_argument("--years", type=int, default=3, help="years of monthly bills per meter")
+    parser.add_argument("--workdir", default=".bench", help="where databases and per-scale secrets are kept")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild databases that already exist")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker()
+        sys.exit()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {n: run_scale(n, args.years, args.workdir, args.regenerate) for n in args.scales}
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
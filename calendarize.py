@@ -0,0 +1,53 @@
+# calendarize.py
+# Splits meter readings across the calendar months they cover, in proportion to
+# the days of each month inside the reading period. A bill from Dec 15 to Jan 14
+# then counts 17 days' worth toward December and 14 toward January instead of
+# all of it landing in the start year.
+#
+# Periods are treated as [startdate, enddate): consecutive bills that share a
+# boundary date are not double counted. A reading that starts and ends on the
+# same day counts as one day.
+import numpy as np
+import pandas as pd
+
+DAY = np.timedelta64(1, 'D')
+
+
+# One row per (input row, calendar month) with `value_columns` scaled by the share
+# of the period's days that fall in that month. Other columns are carried over;
+# `month` (first day of the month) and `year` are added.
+def calendarize(df, value_columns=('usage',)):
+    df = df.dropna(subset=['startdate', 'enddate'])
+    if df.empty:
+        return df.assign(month=pd.Series(dtype='datetime64[ns]'), year=pd.Series(dtype='int64'))
+
+    start = df['startdate'].to_numpy(dtype='datetime64[D]')
+    end = df['enddate'].to_numpy(dtype='datetime64[D]')
+    end = np.maximum(end, start + DAY)
+    days = (end - start) / DAY
+
+    first_month = start.astype('datetime64[M]')
+    last_month = (end - DAY).astype('datetime64[M]')
+    n_months = (last_month - first_month).astype(np.int64) + 1
+
+    # Repeat each row once per month it touches
+    row = np.repeat(np.arange(len(df)), n_months)
+    month_offset = np.arange(len(row)) - np.repeat(np.cumsum(n_months) - n_months, n_months)
+    month = first_month[row] + month_offset
+
+    overlap_start = np.maximum(start[row], month.astype('datetime64[D]'))
+    overlap_end = np.minimum(end[row], (month + 1).astype('datetime64[D]'))
+    share = (overlap_end - overlap_start) / DAY / days[row]
+
+    out = df.iloc[row].reset_index(drop=True)
+    for column in value_columns:
+        out[column] = out[column].to_numpy(dtype=float) * share
+    out['month'] = month.astype('datetime64[ns]')
+    out['year'] = month.astype('datetime64[Y]').astype(np.int64) + 1970
+    return out
+
+
+# Calendarized totals of `value_column` per calendar year for each group in `by`
+def yearly_totals(df, by, value_column='usage'):
+    calendarized = calendarize(df[[*by, 'startdate', 'enddate', value_column]], (value_column,))
+    return calendarized.groupby([*by, 'year'], as_index=False)[value_column].sum()
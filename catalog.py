@@ -0,0 +1,55 @@
+# catalog.py
+# Building catalog shared by every session in the process, rebuilt from
+# ESPMFIRSTTEST at most once per CATALOG_TTL.
+import pandas as pd
+import streamlit as st
+
+import db_helper
+
+CATALOG_TTL = 600  # seconds
+
+
+class BuildingCatalog:
+    def __init__(self, buildings_df):
+        df = buildings_df.assign(
+            espmid=buildings_df['espmid'].astype(str),
+            # Parsed once here instead of on every render
+            sqft=pd.to_numeric(buildings_df['sqfootage'], errors='coerce'),
+        ).drop_duplicates('espmid')
+        self.buildings = df.reset_index(drop=True)
+        # Changes whenever any building row does; used to key cached figures
+        self.version = str(pd.util.hash_pandas_object(self.buildings, index=False).sum())
+
+        # espmid -> building row as a dict
+        self.by_espmid = {row['espmid']: row for row in df.to_dict('records')}
+
+        self.espmids_by_usetype = {
+            usetype: group.tolist()
+            for usetype, group in df.groupby('usetype')['espmid']
+        }
+
+    def __len__(self):
+        return len(self.by_espmid)
+
+    def get(self, espmid):
+        return self.by_espmid.get(str(espmid))
+
+    def usetype_group(self, usetype):
+        return self.espmids_by_usetype.get(usetype, [])
+
+    def usetypes(self):
+        return sorted(self.espmids_by_usetype)
+
+
+@st.cache_resource(ttl=CATALOG_TTL, show_spinner=False)
+def get_catalog():
+    return BuildingCatalog(db_helper.get_buildings())
+
+
+# Look up one building, rebuilding the catalog once if it was added since the last build
+def get_building(espmid):
+    building = get_catalog().get(espmid)
+    if building is None:
+        get_catalog.clear()
+        building = get_catalog().get(espmid)
+    return building
@@ -0,0 +1,95 @@
+# charts.py
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Roughly one point per horizontal pixel of a full-width chart
+MAX_CHART_POINTS = 1000
+
+# Stepped chart for each energy type: (energy type, chart name, title, y axis title, trace name)
+METER_CHARTS = [
+    ("Electric", "Electric meter chart", "Electric Meter Data Over Time", "Usage (kWh)", 'Electric Usage'),
+    ("Natural Gas", "Natural gas meter chart", "Natural Gas Meter Data Over Time", "Usage (therms/CCF)", 'Natural Gas Usage'),
+    ("Solar", "Solar meter chart", "Solar Meter Data Over Time", "Generation (kWh)", 'Solar Generation'),
+]
+
+# Coarser resolutions tried in order when a series has too many points
+RESOLUTIONS = [
+    ("D", "daily"),
+    ("M", "monthly"),
+    ("Y", "yearly"),
+]
+
+
+# Sum usage into the finest period that fits in max_points.
+# Returns the (possibly aggregated) series and the resolution used.
+def downsample_usage(df, max_points=MAX_CHART_POINTS):
+    series = df[['startdate', 'usage']].sort_values('startdate')
+    if len(series) <= max_points:
+        return series, "full"
+
+    for freq, label in RESOLUTIONS:
+        periods = series['startdate'].dt.to_period(freq)
+        if periods.nunique() <= max_points or freq == RESOLUTIONS[-1][0]:
+            aggregated = series.groupby(periods)['usage'].sum()
+            return pd.DataFrame({
+                'startdate': aggregated.index.to_timestamp(),
+                'usage': aggregated.to_numpy(),
+            }), label
+
+
+# Stepped usage chart for one energy type, downsampled to fit the chart width
+def stepped_meter_chart(df, title, yaxis_title, name, max_points=MAX_CHART_POINTS):
+    series, resolution = downsample_usage(df, max_points)
+    if resolution != "full":
+        title = f"{title} ({resolution} totals)"
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=series['startdate'],
+        y=series['usage'],
+        mode='lines',
+        line=dict(shape='hv'),
+        name=name,
+        fill='tozeroy'
+    ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Date",
+        yaxis_title=yaxis_title,
+        height=400
+    )
+    return fig
+
+
+# Bar chart of a building's latest-year EUI (and weather-normalized EUI, when
+# known) next to its use type's baseline
+def eui_comparison_bar(current_eui, baseline_eui_value, latest_year, normalized_eui=None):
+    comparison_df = pd.DataFrame({
+        'Metric': ['Current EUI', 'Baseline EUI'],
+        'Value': [current_eui, baseline_eui_value],
+        'Year': [f'{latest_year}', 'Benchmark']
+    })
+    if normalized_eui is not None and pd.notna(normalized_eui):
+        comparison_df = pd.concat([comparison_df.iloc[:1], pd.DataFrame({
+            'Metric': ['Weather-Normalized EUI'],
+            'Value': [normalized_eui],
+            'Year': [f'{latest_year}'],
+        }), comparison_df.iloc[1:]], ignore_index=True)
+
+    fig_bar = px.bar(
+        comparison_df,
+        x='Metric',
+        y='Value',
+        color='Metric',
+        text='Value',
+        title=f"Energy Use Intensity Comparison (kBTU/sq ft)"
+    )
+    fig_bar.update_traces(texttemplate='%{y:.1f}', textposition='outside')
+    fig_bar.update_layout(
+        showlegend=False,
+        yaxis_title="kBTU/sq ft",
+        xaxis_title=f"Most Recent Year: {latest_year}"
+    )
+    return fig_bar
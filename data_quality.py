@@ -0,0 +1,187 @@
+# data_quality.py
+# Finds meter readings that distort EUI: gaps and overlaps between consecutive
+# readings of a meter, duplicate entryids, zero/negative/missing usage, periods
+# that end before they start, and spikes far above the meter's usual daily rate.
+#
+# Every meter in every fuel table is checked in one vectorized pass, sorted by
+# meterid and startdate. Results are kept in [data_quality] dir (default
+# .data_quality) with a per-table entryid watermark: later scans only re-check
+# the meters that received new readings. Duplicate entryids are counted on the
+# server each scan, since a duplicate never has an entryid above the watermark.
+#
+#   python data_quality.py            # scan new readings
+#   python data_quality.py --rescan   # start over
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import db_helper
+
+DEFAULT_DIR = ".data_quality"
+SCAN_TTL = 900  # seconds between scans from the app
+
+MAX_GAP_DAYS = 1     # readings may start the day after the previous one ended
+SPIKE_FACTOR = 4     # daily rate this many times the meter's median is a spike
+
+ISSUE_COLUMNS = ['espmid', 'energy_type', 'meterid', 'entryid', 'startdate', 'enddate', 'issue', 'detail']
+ISSUE_TYPES = ["Gap", "Overlap", "Duplicate entryid", "Zero or negative usage", "Missing usage",
+               "Ends before it starts", "Spike"]
+
+_scan_lock = threading.Lock()
+
+
+def _dir():
+    return st.secrets.get("data_quality", {}).get("dir", DEFAULT_DIR)
+
+
+def _paths(base):
+    return os.path.join(base, "state.json"), os.path.join(base, "issues.pkl")
+
+
+def load(base=None):
+    state_path, issues_path = _paths(base or _dir())
+    if not os.path.exists(state_path):
+        return {"watermarks": {}}, pd.DataFrame(columns=ISSUE_COLUMNS)
+    with open(state_path) as f:
+        state = json.load(f)
+    return state, pd.read_pickle(issues_path)
+
+
+def _save(base, state, issues):
+    os.makedirs(base, exist_ok=True)
+    state_path, issues_path = _paths(base)
+    issues.to_pickle(issues_path + ".tmp")
+    os.replace(issues_path + ".tmp", issues_path)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def _meter_rows(table_name, where, params):
+    df = db_helper.read_sql(f"""
+        SELECT
+            CAST([espmid] AS VARCHAR(50)) as espmid,
+            CAST([meterid] AS VARCHAR(50)) as meterid,
+            {db_helper.to_bigint('[entryid]')} as entryid,
+            {db_helper.to_float('[usage]')} as usage,
+            [startdate],
+            [enddate]
+        FROM {db_helper.meter_table(table_name)}
+        WHERE {where}
+    """, params=params)
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    return df.assign(energy_type=db_helper.METER_TABLES[table_name])
+
+
+# Issues in a set of complete meter histories, all meters at once
+def find_issues(rows):
+    if rows.empty:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+
+    df = rows.sort_values(['energy_type', 'meterid', 'startdate', 'enddate'], ignore_index=True)
+    same_meter = df['energy_type'].eq(df['energy_type'].shift()) & df['meterid'].eq(df['meterid'].shift())
+    days_since_prev = (df['startdate'] - df['enddate'].shift()).dt.days
+
+    days = (df['enddate'] - df['startdate']).dt.days.clip(lower=1)
+    rate = df['usage'] / days
+    typical_rate = rate.where(rate > 0).groupby([df['energy_type'], df['meterid']]).transform('median')
+    no_value = pd.Series(np.nan, index=df.index)
+
+    # (issue, rows flagged, value shown in the detail, detail format)
+    checks = [
+        ("Gap", same_meter & (days_since_prev > MAX_GAP_DAYS), days_since_prev, "{:.0f} days without readings"),
+        ("Overlap", same_meter & (days_since_prev < 0), -days_since_prev, "overlaps the previous reading by {:.0f} days"),
+        ("Zero or negative usage", df['usage'] <= 0, df['usage'], "usage {:g}"),
+        ("Missing usage", df['usage'].isna(), no_value, "usage is empty or not a number"),
+        ("Ends before it starts", df['enddate'] < df['startdate'], no_value, "enddate is before startdate"),
+        ("Spike", rate > SPIKE_FACTOR * typical_rate, rate / typical_rate, "{:.1f}x the meter's median daily usage"),
+    ]
+    # Details are only formatted for the flagged rows
+    frames = [
+        df.loc[mask, ISSUE_COLUMNS[:-2]].assign(issue=issue, detail=values[mask].map(detail.format))
+        for issue, mask, values, detail in checks
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+# Every row whose entryid appears more than once in its table
+def find_duplicate_entryids():
+    frames = []
+    for table_name in db_helper.METER_TABLES:
+        entryid = db_helper.to_bigint('[entryid]')
+        duplicates = _meter_rows(table_name, f"""{entryid} IN (
+            SELECT {entryid} FROM {db_helper.meter_table(table_name)}
+            GROUP BY {entryid} HAVING COUNT(*) > 1
+        )""", None)
+        counts = duplicates['entryid'].map(duplicates['entryid'].value_counts())
+        frames.append(duplicates.assign(
+            issue="Duplicate entryid",
+            detail=counts.map("entryid used by {} rows".format),
+        )[ISSUE_COLUMNS])
+    return pd.concat(frames, ignore_index=True)
+
+
+# Check new readings and return all known issues. Only meters with readings
+# above the watermark are re-read and re-checked.
+def scan(base=None, rescan=False):
+    base = base or _dir()
+    state, issues = ({"watermarks": {}}, pd.DataFrame(columns=ISSUE_COLUMNS)) if rescan else load(base)
+    issues = issues[issues['issue'] != "Duplicate entryid"]
+
+    for table_name, energy_type in db_helper.METER_TABLES.items():
+        watermark = state["watermarks"].get(table_name, 0)
+        new_rows = _meter_rows(table_name, f"{db_helper.to_bigint('[entryid]')} > :watermark", {"watermark": watermark})
+        if new_rows.empty:
+            continue
+
+        # The rest of each touched meter's history, so its new readings are checked in context
+        meterids = sorted(new_rows['meterid'].dropna().unique().tolist())
+        old_rows = _meter_rows(
+            table_name,
+            f"{db_helper.in_json_list('[meterid]', 'meterids')} AND {db_helper.to_bigint('[entryid]')} <= :watermark",
+            {"meterids": json.dumps(meterids), "watermark": watermark},
+        ) if watermark else new_rows.iloc[:0]
+
+        touched = (issues['energy_type'] == energy_type) & issues['meterid'].isin(meterids)
+        issues = pd.concat([issues[~touched], find_issues(pd.concat([old_rows, new_rows]))], ignore_index=True)
+        state["watermarks"][table_name] = int(new_rows['entryid'].max())
+
+    issues = pd.concat([issues, find_duplicate_entryids()], ignore_index=True)
+    _save(base, state, issues)
+    return issues
+
+
+# All issues, rescanned at most once per SCAN_TTL for the whole process
+@st.cache_data(ttl=SCAN_TTL, show_spinner="Checking meter data...")
+def get_issues():
+    with _scan_lock:
+        return scan()
+
+
+def issues_for_building(espmid):
+    issues = get_issues()
+    return issues[issues['espmid'] == str(espmid)].sort_values(['energy_type', 'startdate'])
+
+
+# Issue counts per building, one column per issue type
+def issue_counts_by_building():
+    issues = get_issues()
+    counts = pd.crosstab(issues['espmid'], issues['issue'])
+    counts = counts.reindex(columns=[issue for issue in ISSUE_TYPES if issue in counts.columns])
+    counts['total'] = counts.sum(axis=1)
+    return counts.sort_values('total', ascending=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan the meter tables for data quality issues.")
+    parser.add_argument("--rescan", action="store_true", help="forget earlier results and check every reading")
+    args = parser.parse_args()
+
+    issues = scan(rescan=args.rescan)
+    print(issues['issue'].value_counts().to_string() if not issues.empty else "No issues found")
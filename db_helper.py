@@ -0,0 +1,749 @@
+# db_helper.py
+# Shared data access for all pages. Every query goes through run_query() with bound
+# parameters, so SQL Server reuses one plan per query shape instead of one per espmid.
+import json
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import inspect, text
+
+from instrumentation import timed_query
+
+# Engine settings shared by every session in the process. Values in
+# [connections.sql.create_engine_kwargs] in secrets.toml take precedence.
+POOL_SIZE = 5            # connections kept open in the pool
+MAX_OVERFLOW = 5         # extra connections allowed under burst load
+POOL_TIMEOUT = 30        # seconds to wait for a free connection before failing
+POOL_RECYCLE = 1800      # seconds before a connection is replaced (Azure drops idle ones)
+QUERY_TIMEOUT = 60       # seconds a single query may run
+LOGIN_TIMEOUT = 15       # seconds to wait when opening a new connection
+
+QUERY_CACHE_TTL = 3600   # seconds query results are cached across sessions
+
+# Meter tables and the energy type label each one is shown with. Only these
+# table names are ever put into SQL text.
+METER_TABLES = {
+    "electric": "Electric",
+    "naturalgas": "Natural Gas",
+    "solar": "Solar",
+}
+
+METER_COLUMNS = ['entryid', 'meterid', 'usage', 'startdate', 'enddate', 'energy_type', 'year']
+
+
+def _engine_kwargs():
+    kwargs = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    sql_secrets = st.secrets.get("connections", {}).get("sql", {})
+    if "mssql" in str(sql_secrets.get("url", sql_secrets.get("dialect", ""))):
+        # pymssql applies `timeout` to every query run on the connection
+        kwargs["connect_args"] = {"timeout": QUERY_TIMEOUT, "login_timeout": LOGIN_TIMEOUT}
+    kwargs.update(sql_secrets.get("create_engine_kwargs", {}))
+    return kwargs
+
+
+# The pooled connection shared by all pages and sessions
+def get_connection():
+    return st.connection("sql", type="sql", **_engine_kwargs())
+
+
+# Run a query with bound parameters, returning the connection to the pool when done
+def read_sql(sql, params=None):
+    with get_connection().engine.connect() as connection:
+        return pd.read_sql(text(sql), connection, params=params)
+
+
+# Same as read_sql, with results cached across sessions
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def run_query(sql, params=None):
+    return read_sql(sql, params)
+
+
+# The queries are written for SQL Server. These helpers swap in the SQLite
+# equivalents when [connections.sql] points at a local SQLite stand-in.
+def is_sqlite():
+    return get_connection().engine.dialect.name == "sqlite"
+
+
+def table(table_name):
+    return f"[{table_name}]" if is_sqlite() else f"[dbo].[{table_name}]"
+
+
+# True once `python ingest.py migrate` has given the numeric columns real types;
+# set [database] typed_columns = true and reads stop casting them
+def typed_columns():
+    return bool(st.secrets.get("database", {}).get("typed_columns", False))
+
+
+def to_float(column):
+    if typed_columns():
+        return column
+    return f"CAST({column} AS REAL)" if is_sqlite() else f"TRY_CAST({column} AS FLOAT)"
+
+
+def to_bigint(column):
+    if typed_columns():
+        return column
+    return f"CAST({column} AS INTEGER)" if is_sqlite() else f"TRY_CAST({column} AS BIGINT)"
+
+
+def year_of(column):
+    return f"CAST(strftime('%Y', {column}) AS INTEGER)" if is_sqlite() else f"YEAR({column})"
+
+
+# `column IN (...)` against a JSON array bound as a single parameter, so the
+# query text (and its plan) is the same however many values are passed
+def in_json_list(column, param):
+    if is_sqlite():
+        return f"{column} IN (SELECT value FROM json_each(:{param}))"
+    return f"{column} IN (SELECT [value] FROM OPENJSON(:{param}))"
+
+
+# LIKE patterns for `term`, with wildcards in the term escaped (use ESCAPE '\')
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("[", "\\[")
+
+
+def like_contains(term):
+    return f"%{_escape_like(term)}%"
+
+
+def like_prefix(term):
+    return f"{_escape_like(term)}%"
+
+
+def meter_table(table_name):
+    if table_name not in METER_TABLES:
+        raise ValueError(f"Unknown meter table: {table_name}")
+    return table(table_name)
+
+
+# Use the local snapshot instead of the database when it is enabled in secrets.toml
+def _snapshot():
+    import snapshot
+    return snapshot if snapshot.is_enabled() else None
+
+
+# Read building and monthly kBTU data from the tables rollup_tables.py maintains
+def rollup_tables_enabled():
+    return bool(st.secrets.get("rollup_tables", {}).get("enabled", False))
+
+
+# One UNION ALL over every meter table, so a building costs a single round-trip
+def _meter_union_query():
+    selects = [
+        f"""
+        SELECT
+            [entryid],
+            [meterid],
+            {to_float('[usage]')} as usage,
+            [startdate],
+            [enddate],
+            '{energy_type}' as energy_type
+        FROM {meter_table(table_name)}
+        WHERE [espmid] = :espmid
+        """
+        for table_name, energy_type in METER_TABLES.items()
+    ]
+    return "UNION ALL".join(selects) + "ORDER BY [startdate]"
+
+
+# Get electric, natural gas and solar rows for one building as one typed dataframe.
+# Not cached here: meter_store keeps one shared compact copy per building.
+@timed_query
+def get_meter_data(espmid):
+    snap = _snapshot()
+    if snap:
+        df = snap.meter_rows(espmid=str(espmid))
+    else:
+        df = read_sql(_meter_union_query(), params={"espmid": str(espmid)})
+    if df.empty:
+        # Keep the columns (including 'year') so callers can filter an empty frame
+        return pd.DataFrame(columns=METER_COLUMNS)
+
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    df['year'] = df['startdate'].dt.year
+    return df[METER_COLUMNS]
+
+
+MAX_COMPARE = 50  # buildings the comparison view accepts at once
+
+
+# Meter rows for a set of buildings from all meter tables in one query. The espmids
+# go over as a single JSON list parameter, so the query text (and its cached plan)
+# is the same however many buildings are selected.
+@timed_query
+def get_meter_data_for(espmids):
+    espmids = sorted({str(espmid) for espmid in espmids})
+    if not espmids:
+        return pd.DataFrame(columns=['espmid'] + METER_COLUMNS)
+
+    snap = _snapshot()
+    if snap:
+        df = snap.meter_rows(espmids=espmids)
+    else:
+        selects = [
+            f"""
+            SELECT
+                CAST([espmid] AS VARCHAR(50)) as espmid,
+                [entryid],
+                [meterid],
+                {to_float('[usage]')} as usage,
+                [startdate],
+                [enddate],
+                '{energy_type}' as energy_type
+            FROM {meter_table(table_name)}
+            WHERE {in_json_list('[espmid]', 'espmids')}
+            """
+            for table_name, energy_type in METER_TABLES.items()
+        ]
+        df = run_query("UNION ALL".join(selects) + "ORDER BY [startdate]", params={"espmids": json.dumps(espmids)})
+    if df.empty:
+        return pd.DataFrame(columns=['espmid'] + METER_COLUMNS)
+
+    df['espmid'] = df['espmid'].astype(str)
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    df['year'] = df['startdate'].dt.year
+    return df[['espmid'] + METER_COLUMNS]
+
+
+# Split the combined frame back into one frame per energy type
+def split_by_energy_type(all_meter_data):
+    return {
+        energy_type: all_meter_data[all_meter_data['energy_type'] == energy_type]
+        for energy_type in METER_TABLES.values()
+    }
+
+
+ACCOUNT_COLUMNS = ['buildingname', 'sqfootage', 'address', 'usetype', 'occupancy', 'numbuildings']
+ACCOUNT_PAGE_SIZE = 100
+
+# Sortable Account Details columns and their labels
+ACCOUNT_SORT_COLUMNS = {
+    "buildingname": "Building Name",
+    "sqfootage": "Square Footage",
+    "usetype": "Use Type",
+}
+
+
+# NULLs sort as '' or -1 so the keyset comparison never meets a NULL
+def _account_sort_key(sort_column):
+    if sort_column not in ACCOUNT_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort_column}")
+    return {
+        "buildingname": "COALESCE([buildingname], '')",
+        "sqfootage": f"COALESCE({to_float('[sqfootage]')}, -1)",
+        "usetype": "COALESCE([usetype], '')",
+    }[sort_column]
+
+
+def _account_filters(usetypes, min_sqft, max_sqft, name_search):
+    conditions, params = ["1 = 1"], {}
+    if usetypes:
+        conditions.append(in_json_list("[usetype]", "usetypes"))
+        params["usetypes"] = json.dumps(list(usetypes))
+    if min_sqft:
+        conditions.append(f"{to_float('[sqfootage]')} >= :min_sqft")
+        params["min_sqft"] = float(min_sqft)
+    if max_sqft:
+        conditions.append(f"{to_float('[sqfootage]')} <= :max_sqft")
+        params["max_sqft"] = float(max_sqft)
+    if name_search:
+        conditions.append("[buildingname] LIKE :name_pattern ESCAPE '\\'")
+        params["name_pattern"] = like_contains(name_search)
+    return " AND ".join(conditions), params
+
+
+def _filter_account_frame(df, usetypes, min_sqft, max_sqft, name_search):
+    sqft = pd.to_numeric(df['sqfootage'], errors='coerce')
+    keep = pd.Series(True, index=df.index)
+    if usetypes:
+        keep &= df['usetype'].isin(usetypes)
+    if min_sqft:
+        keep &= sqft >= min_sqft
+    if max_sqft:
+        keep &= sqft <= max_sqft
+    if name_search:
+        keep &= df['buildingname'].fillna('').str.contains(name_search, case=False, regex=False)
+    return df[keep].assign(sort_key_sqfootage=sqft[keep].fillna(-1))
+
+
+# One page of the Account Details building table, filtered and sorted in SQL.
+# `after` is the (sort_key, espmid) of the last row on the previous page; the
+# returned frame has a sort_key column to build the next one from. One extra row
+# is fetched so callers can tell whether another page follows.
+@timed_query
+def get_account_page(sort_column="buildingname", descending=False, usetypes=(), min_sqft=None,
+                     max_sqft=None, name_search="", after=None, page_size=ACCOUNT_PAGE_SIZE):
+    snap = _snapshot()
+    if snap:
+        df = _filter_account_frame(snap.read_table("ESPMFIRSTTEST"), usetypes, min_sqft, max_sqft, name_search)
+        sort_key = df['sort_key_sqfootage'] if sort_column == "sqfootage" else df[sort_column].fillna('')
+        df = df.assign(sort_key=sort_key).sort_values(['sort_key', 'espmid'], ascending=not descending)
+        if after is not None:
+            if descending:
+                past = (df['sort_key'] < after[0]) | ((df['sort_key'] == after[0]) & (df['espmid'] < after[1]))
+            else:
+                past = (df['sort_key'] > after[0]) | ((df['sort_key'] == after[0]) & (df['espmid'] > after[1]))
+            df = df[past]
+        return df[['espmid', *ACCOUNT_COLUMNS, 'sort_key']].head(page_size + 1)
+
+    sort_key = _account_sort_key(sort_column)
+    conditions, params = _account_filters(usetypes, min_sqft, max_sqft, name_search)
+    direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+    if after is not None:
+        conditions += (f" AND ({sort_key} {comparison} :after_key"
+                       f" OR ({sort_key} = :after_key AND [espmid] {comparison} :after_espmid))")
+        params.update(after_key=after[0], after_espmid=after[1])
+
+    columns = ", ".join(f"[{column}]" for column in ['espmid', *ACCOUNT_COLUMNS])
+    top = "" if is_sqlite() else f"TOP ({page_size + 1})"
+    limit = f"LIMIT {page_size + 1}" if is_sqlite() else ""
+    return run_query(f"""
+        SELECT {top} {columns}, {sort_key} as sort_key
+        FROM {table('ESPMFIRSTTEST')}
+        WHERE {conditions}
+        ORDER BY {sort_key} {direction}, [espmid] {direction}
+        {limit}
+    """, params=params)
+
+
+# Number of buildings matching the Account Details filters
+def count_account_buildings(usetypes=(), min_sqft=None, max_sqft=None, name_search=""):
+    snap = _snapshot()
+    if snap:
+        return len(_filter_account_frame(snap.read_table("ESPMFIRSTTEST"), usetypes, min_sqft, max_sqft, name_search))
+
+    conditions, params = _account_filters(usetypes, min_sqft, max_sqft, name_search)
+    df = run_query(f"SELECT COUNT(*) as n FROM {table('ESPMFIRSTTEST')} WHERE {conditions}", params=params)
+    return int(df['n'].iloc[0])
+
+
+BUILDING_COLUMNS = ['espmid', 'buildingname', 'usetype', 'sqfootage', 'address']
+
+
+# Get all buildings with their use type, square footage and address. Not cached
+# here: the building catalog holds the result for the whole process.
+@timed_query
+def get_buildings():
+    if rollup_tables_enabled():
+        return read_sql(f"""
+            SELECT [espmid], [buildingname], [usetype], [sqft] as sqfootage, [address]
+            FROM {table('building_dim')}
+            WHERE [buildingname] IS NOT NULL
+            ORDER BY [buildingname]
+        """)
+
+    snap = _snapshot()
+    if snap:
+        df = snap.read_table("ESPMFIRSTTEST")[BUILDING_COLUMNS]
+        df = df.dropna(subset=['buildingname', 'espmid']).drop_duplicates()
+        return df.sort_values('buildingname', ignore_index=True)
+
+    return read_sql(f"""
+        SELECT DISTINCT
+            [espmid],
+            [buildingname],
+            [usetype],
+            [sqfootage],
+            [address]
+        FROM {table('ESPMFIRSTTEST')}
+        WHERE [buildingname] IS NOT NULL
+        AND [espmid] IS NOT NULL
+        ORDER BY [buildingname]
+    """)
+
+
+SEARCH_LIMIT = 25  # matches shown in the building picker
+
+
+# Top matches for a building name, address or ESPM ID search. ESPM ID matches
+# come first, then names starting with the term, then names and addresses
+# containing it. Only the matches are fetched, never the full building list.
+@timed_query
+def search_buildings(term, limit=SEARCH_LIMIT):
+    term = term.strip()
+    snap = None if rollup_tables_enabled() else _snapshot()
+    if snap:
+        df = snap.read_table("ESPMFIRSTTEST")[BUILDING_COLUMNS].dropna(subset=['buildingname', 'espmid'])
+        name = df['buildingname'].str.lower()
+        address = df['address'].fillna('').str.lower()
+        espmid = df['espmid'].astype(str)
+        df = df.assign(espmid=espmid)
+        match_rank = pd.Series(3, index=df.index)
+        match_rank[name.str.contains(term.lower(), regex=False)] = 2
+        match_rank[name.str.startswith(term.lower())] = 1
+        match_rank[espmid == term] = 0
+        found = (match_rank < 3) | address.str.contains(term.lower(), regex=False) | espmid.str.startswith(term)
+        df = df[found].assign(match_rank=match_rank[found])
+        return df.sort_values(['match_rank', 'buildingname']).head(limit)[BUILDING_COLUMNS].reset_index(drop=True)
+
+    espmid = "CAST([espmid] AS VARCHAR(50))"
+    top = "" if is_sqlite() else "TOP (:limit)"
+    limit_clause = "LIMIT :limit" if is_sqlite() else ""
+    # Search the same table the catalog is built from, so every match can be opened
+    if rollup_tables_enabled():
+        source, sqfootage = table('building_dim'), "[sqft] as sqfootage"
+    else:
+        source, sqfootage = table('ESPMFIRSTTEST'), "[sqfootage]"
+    # espmid comes back as text, the key every building frame on the pages uses
+    return run_query(f"""
+        SELECT {top}
+            {espmid} as espmid,
+            [buildingname],
+            [usetype],
+            {sqfootage},
+            [address]
+        FROM {source}
+        WHERE [buildingname] IS NOT NULL
+        AND [espmid] IS NOT NULL
+        AND (
+            [buildingname] LIKE :contains ESCAPE '\\'
+            OR [address] LIKE :contains ESCAPE '\\'
+            OR {espmid} LIKE :prefix ESCAPE '\\'
+        )
+        ORDER BY
+            CASE
+                WHEN {espmid} = :term THEN 0
+                WHEN [buildingname] LIKE :prefix ESCAPE '\\' THEN 1
+                WHEN [buildingname] LIKE :contains ESCAPE '\\' THEN 2
+                ELSE 3
+            END,
+            [buildingname]
+        {limit_clause}
+    """, params={"term": term, "prefix": like_prefix(term), "contains": like_contains(term), "limit": int(limit)})
+
+
+# Total square footage and building count for each building type
+@timed_query
+def get_usetype_summary():
+    if rollup_tables_enabled():
+        return run_query(f"""
+            SELECT
+                [usetype],
+                COALESCE(SUM([sqft]), 0) as total_sqft,
+                COUNT(*) as building_count
+            FROM {table('building_dim')}
+            GROUP BY [usetype]
+            ORDER BY total_sqft DESC
+        """)
+
+    snap = _snapshot()
+    if snap:
+        df = snap.read_table("ESPMFIRSTTEST")
+        df = df.assign(total_sqft=pd.to_numeric(df['sqfootage'], errors='coerce').fillna(0))
+        df = df.groupby('usetype', dropna=False, as_index=False).agg(
+            total_sqft=('total_sqft', 'sum'),
+            building_count=('espmid', 'size'),
+        )
+        return df.sort_values('total_sqft', ascending=False, ignore_index=True)
+
+    return run_query(f"""
+        SELECT
+            [usetype],
+            COALESCE(SUM({to_float('[sqfootage]')}), 0) as total_sqft,
+            COUNT(*) as building_count
+        FROM {table('ESPMFIRSTTEST')}
+        GROUP BY [usetype]
+        ORDER BY total_sqft DESC
+    """)
+
+
+PORTFOLIO_METER_COLUMNS = ['espmid', 'energy_type', 'usage', 'startdate', 'enddate']
+
+
+# Every meter reading in the portfolio, from all meter tables in one query, or
+# only the readings whose period overlaps `year`. Not cached here: callers cache
+# what they compute from it, which is far smaller.
+@timed_query
+def get_portfolio_meter_rows(year=None):
+    params = None
+    if year is not None:
+        params = {"year_start": f"{int(year)}-01-01", "next_year_start": f"{int(year) + 1}-01-01"}
+
+    snap = _snapshot()
+    if snap:
+        df = snap.meter_rows()[PORTFOLIO_METER_COLUMNS]
+    else:
+        in_year = "AND [startdate] < :next_year_start AND [enddate] >= :year_start" if params else ""
+        selects = [
+            f"""
+            SELECT
+                [espmid],
+                '{energy_type}' as energy_type,
+                {to_float('[usage]')} as usage,
+                [startdate],
+                [enddate]
+            FROM {meter_table(table_name)}
+            WHERE [espmid] IS NOT NULL
+            {in_year}
+            """
+            for table_name, energy_type in METER_TABLES.items()
+        ]
+        df = read_sql("UNION ALL".join(selects), params=params)
+    if df.empty:
+        return pd.DataFrame(columns=PORTFOLIO_METER_COLUMNS)
+
+    df['espmid'] = df['espmid'].astype(str)
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    if params:
+        df = df[(df['startdate'] < params["next_year_start"]) & (df['enddate'] >= params["year_start"])]
+    return df.dropna(subset=['usage'])
+
+
+# Net kBTU per building and year from meter_monthly, in the shape of eui.yearly_kbtu()
+@timed_query
+def get_yearly_kbtu():
+    df = read_sql(f"""
+        SELECT
+            [espmid],
+            {year_of('[month]')} as year,
+            SUM([kbtu]) as total_kbtu,
+            SUM([readings_started]) as readings_started
+        FROM {table('meter_monthly')}
+        GROUP BY [espmid], {year_of('[month]')}
+    """)
+    df['year'] = df['year'].astype(int)
+    df['reading_starts'] = df.pop('readings_started') > 0
+    return df
+
+
+# Monthly kBTU rows from meter_monthly for every building, in the shape of
+# eui.monthly_kbtu(), for all years or just `year`
+def get_monthly_kbtu(year=None):
+    in_year = f"WHERE {year_of('[month]')} = :year" if year is not None else ""
+    df = read_sql(f"""
+        SELECT
+            [espmid],
+            [energy_type],
+            [month],
+            {year_of('[month]')} as year,
+            [kbtu],
+            [readings_started]
+        FROM {table('meter_monthly')}
+        {in_year}
+    """, params={"year": int(year)} if year is not None else None)
+    df['month'] = pd.to_datetime(df['month'])
+    df['year'] = df['year'].astype(int)
+    return df
+
+
+# Monthly kBTU rows from meter_monthly for a set of buildings, in the shape of eui.monthly_kbtu()
+@timed_query
+def get_monthly_kbtu_for(espmids):
+    df = run_query(f"""
+        SELECT
+            [espmid],
+            [energy_type],
+            [month],
+            {year_of('[month]')} as year,
+            [kbtu],
+            [readings_started]
+        FROM {table('meter_monthly')}
+        WHERE {in_json_list('[espmid]', 'espmids')}
+        ORDER BY [month]
+    """, params={"espmids": json.dumps(sorted({str(espmid) for espmid in espmids}))})
+    df['month'] = pd.to_datetime(df['month'])
+    df['year'] = df['year'].astype(int)
+    return df
+
+
+# Row count and highest entryid per year across the meter tables. A year's token
+# only changes when meter rows starting or ending in that year are added, changed
+# or removed (a reading that crosses New Year counts toward both years).
+def get_year_versions():
+    if rollup_tables_enabled():
+        # The pages read the rollups, so versions follow them rather than the raw rows
+        df = read_sql(f"""
+            SELECT
+                {year_of('[month]')} as year,
+                COUNT(*) as row_count,
+                SUM([readings_started]) as readings,
+                SUM([kbtu]) as kbtu
+            FROM {table('meter_monthly')}
+            GROUP BY {year_of('[month]')}
+        """)
+        return {
+            int(row.year): f"{row.row_count}:{row.readings}:{row.kbtu:.0f}"
+            for row in df.itertuples()
+        }
+
+    snap = _snapshot()
+    if snap:
+        meters = snap.meter_rows()
+        df = pd.concat([
+            meters.assign(year=pd.to_datetime(meters[column]).dt.year)
+            for column in ['startdate', 'enddate']
+        ])
+        df = df.groupby('year', as_index=False).agg(row_count=('entryid', 'size'), max_entryid=('entryid', 'max'))
+    else:
+        selects = [
+            f"""
+            SELECT
+                {year_of(f'[{column}]')} as year,
+                COUNT(*) as row_count,
+                MAX([entryid]) as max_entryid
+            FROM {meter_table(table_name)}
+            GROUP BY {year_of(f'[{column}]')}
+            """
+            for table_name in METER_TABLES
+            for column in ['startdate', 'enddate']
+        ]
+        df = read_sql("UNION ALL".join(selects))
+        df = df.dropna(subset=['year']).groupby('year', as_index=False).agg(
+            row_count=('row_count', 'sum'), max_entryid=('max_entryid', 'max')
+        )
+
+    return {
+        int(row.year): f"{row.row_count}:{row.max_entryid}"
+        for row in df.itertuples()
+    }
+
+
+# Buildings whose first meter reading falls in the given year, with their square footage
+@timed_query
+def get_first_year_buildings(year):
+    if rollup_tables_enabled():
+        return read_sql(f"""
+            SELECT b.[espmid], b.[sqft]
+            FROM {table('building_dim')} b
+            JOIN (
+                SELECT [espmid]
+                FROM {table('meter_monthly')}
+                WHERE [readings_started] > 0
+                GROUP BY [espmid]
+                HAVING {year_of('MIN([month])')} = :year
+            ) f ON f.[espmid] = b.[espmid]
+        """, params={"year": int(year)})
+
+    snap = _snapshot()
+    if snap:
+        meters = snap.meter_rows()
+        first_year = pd.to_datetime(meters['startdate']).groupby(meters['espmid']).min().dt.year
+        new_espmids = first_year[first_year == year].index
+        buildings = snap.read_table("ESPMFIRSTTEST")
+        df = buildings[buildings['espmid'].isin(new_espmids)][['espmid', 'sqfootage']]
+        return df.assign(sqft=pd.to_numeric(df['sqfootage'], errors='coerce'))[['espmid', 'sqft']]
+
+    meter_rows = " UNION ALL ".join(
+        f"SELECT [espmid], [startdate] FROM {meter_table(table_name)}"
+        for table_name in METER_TABLES
+    )
+    return read_sql(f"""
+        SELECT
+            b.[espmid],
+            {to_float('b.[sqfootage]')} as sqft
+        FROM {table('ESPMFIRSTTEST')} b
+        JOIN (
+            SELECT [espmid]
+            FROM ({meter_rows}) m
+            GROUP BY [espmid]
+            HAVING {year_of('MIN([startdate])')} = :year
+        ) f ON f.[espmid] = b.[espmid]
+    """, params={"year": int(year)})
+
+
+# Water meter readings (gallons) live in their own table with the same columns as
+# the meter tables. They are not energy, so they stay out of METER_TABLES (and
+# the snapshot and rollup tables) and are always read from the database.
+WATER_TABLE = "water"
+WATER_COLUMNS = ['entryid', 'meterid', 'usage', 'startdate', 'enddate', 'year']
+PORTFOLIO_WATER_COLUMNS = ['espmid', 'usage', 'startdate', 'enddate']
+WATER_TABLE_CHECK_TTL = 300  # seconds before looking for a newly created water table again
+
+
+# Older databases have no water table (the first `python ingest.py water` load
+# creates it); the water views stay empty until there is one
+@st.cache_data(ttl=WATER_TABLE_CHECK_TTL, show_spinner=False)
+def has_water_table():
+    engine = get_connection().engine
+    return inspect(engine).has_table(WATER_TABLE, schema=None if is_sqlite() else "dbo")
+
+
+# Water readings for one building, oldest first
+@timed_query
+def get_water_data(espmid):
+    if not has_water_table():
+        return pd.DataFrame(columns=WATER_COLUMNS)
+
+    df = run_query(f"""
+        SELECT
+            [entryid],
+            [meterid],
+            {to_float('[usage]')} as usage,
+            [startdate],
+            [enddate]
+        FROM {table(WATER_TABLE)}
+        WHERE [espmid] = :espmid
+        ORDER BY [startdate]
+    """, params={"espmid": str(espmid)})
+    if df.empty:
+        return pd.DataFrame(columns=WATER_COLUMNS)
+
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    df['year'] = df['startdate'].dt.year
+    return df[WATER_COLUMNS]
+
+
+# Every water reading in the portfolio, or only those whose period overlaps `year`
+@timed_query
+def get_portfolio_water_rows(year=None):
+    if not has_water_table():
+        return pd.DataFrame(columns=PORTFOLIO_WATER_COLUMNS)
+
+    params = None
+    in_year = ""
+    if year is not None:
+        params = {"year_start": f"{int(year)}-01-01", "next_year_start": f"{int(year) + 1}-01-01"}
+        in_year = "AND [startdate] < :next_year_start AND [enddate] >= :year_start"
+    df = read_sql(f"""
+        SELECT
+            [espmid],
+            {to_float('[usage]')} as usage,
+            [startdate],
+            [enddate]
+        FROM {table(WATER_TABLE)}
+        WHERE [espmid] IS NOT NULL
+        {in_year}
+    """, params=params)
+    if df.empty:
+        return pd.DataFrame(columns=PORTFOLIO_WATER_COLUMNS)
+
+    df['espmid'] = df['espmid'].astype(str)
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    return df.dropna(subset=['usage'])
+
+
+# Row count and highest entryid per year of the water table, like get_year_versions()
+def get_water_year_versions():
+    if not has_water_table():
+        return {}
+
+    df = read_sql("UNION ALL".join(
+        f"""
+        SELECT
+            {year_of(f'[{column}]')} as year,
+            COUNT(*) as row_count,
+            MAX([entryid]) as max_entryid
+        FROM {table(WATER_TABLE)}
+        GROUP BY {year_of(f'[{column}]')}
+        """
+        for column in ['startdate', 'enddate']
+    ))
+    df = df.dropna(subset=['year']).groupby('year', as_index=False).agg(
+        row_count=('row_count', 'sum'), max_entryid=('max_entryid', 'max')
+    )
+    return {
+        int(row.year): f"{row.row_count}:{row.max_entryid}"
+        for row in df.itertuples()
+    }
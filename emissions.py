@@ -0,0 +1,119 @@
+# emissions.py
+# Carbon emissions computed from the meter data, replacing hand-typed series.
+#
+# Each fuel's calendarized kBTU is multiplied by that fuel's emission factor for
+# the year, from emission_factors.csv (kg CO2e per kWh or therm; years missing
+# from the table use the nearest year listed). Solar generation carries the
+# electric factor with a negative sign, so it nets off grid emissions.
+#
+# Per-building totals are a per-year rollup (see rollups.py): only years that
+# received new meter rows are recomputed. Restart the app after editing the
+# factor table.
+#
+# Each building's baseline is its first year with all 12 months of readings.
+# The 2030 target is half the baseline, and the yearly target falls in a
+# straight line from the baseline year to 2030.
+import os
+
+import pandas as pd
+import streamlit as st
+
+from catalog import get_catalog
+from eui import KBTU_FACTORS, portfolio_monthly_kbtu
+from rollups import data_version, get_rollup, rollup
+
+FACTORS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emission_factors.csv")
+
+TARGET_YEAR = 2030
+TARGET_REDUCTION = 0.5  # 2030 target: half of each building's baseline emissions
+
+# Factor each energy type is charged at; solar offsets grid electricity
+FACTOR_FUELS = {
+    "Electric": "Electric",
+    "Natural Gas": "Natural Gas",
+    "Solar": "Electric",
+}
+
+DISTRICT_COLUMNS = ['years', 'baseline', 'current', 'yearly_target', 'target_2030']
+
+
+# kg CO2e per kBTU for each fuel and year in the table
+@st.cache_data(show_spinner=False)
+def load_factors(path=FACTORS_FILE):
+    df = pd.read_csv(path, comment='#', skipinitialspace=True)
+    df['kg_per_kbtu'] = df['kg_co2e_per_unit'] / df['energy_type'].map(KBTU_FACTORS).abs()
+    return df[['year', 'energy_type', 'kg_per_kbtu']]
+
+
+# Factor for every energy type in every year given, from the nearest year in the table
+def factors_for_years(factors, years):
+    years = pd.DataFrame({'year': sorted(int(year) for year in years)})
+    by_fuel = {
+        fuel: pd.merge_asof(years, rows.sort_values('year'), on='year', direction='nearest')['kg_per_kbtu']
+        for fuel, rows in factors.groupby('energy_type')
+    }
+    return pd.DataFrame(
+        {energy_type: by_fuel[fuel].to_numpy() for energy_type, fuel in FACTOR_FUELS.items()},
+        index=years['year'],
+    )
+
+
+# MT CO2e and months with readings per building and year, from monthly kBTU rows
+# (see eui.monthly_kbtu), in one grouped pass
+def building_emissions(monthly_df, factors):
+    if monthly_df.empty:
+        return pd.DataFrame(columns=['espmid', 'year', 'emissions_mt', 'months'])
+
+    years = sorted(monthly_df['year'].unique())
+    by_fuel = factors_for_years(factors, years).stack().rename('kg_per_kbtu')
+    by_fuel.index.names = ['year', 'energy_type']
+
+    df = monthly_df.merge(by_fuel.reset_index(), on=['year', 'energy_type'], how='left')
+    df['emissions_mt'] = df['kbtu'] * df['kg_per_kbtu'] / 1000
+    return df.groupby(['espmid', 'year'], as_index=False).agg(
+        emissions_mt=('emissions_mt', 'sum'),
+        months=('month', 'nunique'),
+    )
+
+
+@rollup("emissions")
+def _emissions_year(year):
+    return building_emissions(portfolio_monthly_kbtu(year), load_factors()).drop(columns='year')
+
+
+# Emissions, baseline and targets (MT CO2e) per building and year
+@st.cache_data(max_entries=2, show_spinner=False)
+def _building_emissions_by_year(version, catalog_version):
+    df = get_rollup("emissions")
+    if 'espmid' not in df.columns:
+        return pd.DataFrame(columns=['espmid', 'year', 'emissions_mt', 'months', 'sqft', 'baseline_year',
+                                     'baseline_mt', 'yearly_target_mt', 'target_2030_mt'])
+
+    df = df.merge(get_catalog().buildings[['espmid', 'sqft']], on='espmid', how='left')
+    complete = df[df['months'] == 12]
+    baseline = complete.loc[complete.groupby('espmid')['year'].idxmin(), ['espmid', 'year', 'emissions_mt']]
+    df = df.merge(baseline.rename(columns={'year': 'baseline_year', 'emissions_mt': 'baseline_mt'}),
+                  on='espmid', how='left')
+
+    progress = ((df['year'] - df['baseline_year']) / (TARGET_YEAR - df['baseline_year'])).clip(0, 1)
+    df['target_2030_mt'] = df['baseline_mt'] * (1 - TARGET_REDUCTION)
+    df['yearly_target_mt'] = df['baseline_mt'] * (1 - TARGET_REDUCTION * progress.fillna(1))
+    return df
+
+
+def get_building_emissions():
+    return _building_emissions_by_year(data_version(), get_catalog().version)
+
+
+# District MT CO2e per sq ft by year: buildings with a full year of readings, a
+# baseline and a square footage, summed before dividing
+def get_district_emissions():
+    df = get_building_emissions()
+    df = df[(df['months'] == 12) & (df['sqft'] > 0) & df['baseline_mt'].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=DISTRICT_COLUMNS)
+
+    totals = df.groupby('year')[['baseline_mt', 'emissions_mt', 'yearly_target_mt', 'target_2030_mt', 'sqft']].sum()
+    mt_per_sqft = totals.drop(columns='sqft').div(totals['sqft'], axis=0)
+    mt_per_sqft.columns = DISTRICT_COLUMNS[1:]
+    return mt_per_sqft.rename_axis('years').reset_index()
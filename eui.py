@@ -0,0 +1,160 @@
+# eui.py
+import pandas as pd
+import streamlit as st
+
+import db_helper
+from calendarize import calendarize
+
+# Conversion factors
+KWH_TO_KBTU = 3.412  # 1 kWh = 3.412 kBTU
+THERM_TO_KBTU = 100  # 1 therm = 100 kBTU (also ~1 CCF = 100 kBTU)
+
+# kBTU per unit of usage for each energy type (solar is subtracted since it reduces energy use)
+KBTU_FACTORS = {
+    "Electric": KWH_TO_KBTU,
+    "Natural Gas": THERM_TO_KBTU,
+    "Solar": -KWH_TO_KBTU,
+}
+
+# Baseline EUI lookup dictionary (in kBTU/sq ft)
+baseline_eui = {
+    "Adult Education": 60,
+    "Bar/Nightclub": 150,
+    "College/University": 100,
+    "Courthouse": 79,
+    "Distribution Center": 50,
+    "Drinking Water Treatment & Distribution": 300,
+    "Energy/Power Station": 100,
+    "Financial Office": 100,
+    "Fire Station": 79,
+    "Fitness Center/Health Club/Gym": 55,
+    "Heated Swimming Pool": 354,
+    "Hotel": 88,
+    "Ice/Curling Rink": 150,
+    "K-12 School": 80,
+    "Laboratory": 50,
+    "Library": 50,
+    "Manufacturing/Industrial Plant": 50,
+    "Mixed Use Property": 50,
+    "Multifamily Housing": 55,
+    "Museum": 50,
+    "Non-Refrigerated Warehouse": 50,
+    "Office": 80,
+    "Other": 40,
+    "Other - Education": 40,
+    "Other - Entertainment/Public Assembly": 40,
+    "Other - Mall": 40,
+    "Other - Public Services": 40,
+    "Other - Recreation": 50,
+    "Other - Restaurant/Bar": 231,
+    "Other - Technology/Science": 50,
+    "Other - Utility": 50,
+    "Personal Services (Health/Beauty, Dry Cleaning, etc.)": 50,
+    "Residence Hall/Dormitory": 125,
+    "Restaurant": 200,
+    "Retail Store": 105,
+    "Single-Family Home": 39,
+    "Social/Meeting Hall": 100,
+    "Strip Mall": 110,
+    "Transportation Terminal/Station": 150,
+    "Worship Facility": 50
+}
+
+EUI_COLUMNS = [
+    'espmid', 'buildingname', 'usetype', 'sqft', 'latest_year', 'total_kbtu',
+    'current_eui', 'baseline_eui', 'eui_gap', 'eui_gap_pct'
+]
+
+
+MONTHLY_KBTU_COLUMNS = ['espmid', 'energy_type', 'month', 'year', 'kbtu', 'readings_started']
+
+
+# Net kBTU per building, energy type and calendar month from calendarized meter
+# rows (see calendarize.py). readings_started counts the readings that begin in
+# the month, as opposed to ones spilling into it from the month before.
+def monthly_kbtu(calendarized_df):
+    if calendarized_df.empty:
+        return pd.DataFrame(columns=MONTHLY_KBTU_COLUMNS)
+
+    df = calendarized_df
+    return (
+        df.assign(
+            espmid=df['espmid'].astype(str),
+            kbtu=df['usage'].astype(float) * df['energy_type'].map(KBTU_FACTORS).astype(float),
+            readings_started=(df['startdate'].dt.to_period('M').dt.to_timestamp() == df['month']).astype(int),
+        )
+        .groupby(['espmid', 'energy_type', 'month', 'year'], as_index=False, observed=True)
+        .agg(kbtu=('kbtu', 'sum'), readings_started=('readings_started', 'sum'))
+    )[MONTHLY_KBTU_COLUMNS]
+
+
+# Net kBTU per building and calendar year from monthly kBTU rows
+def yearly_kbtu(monthly_df):
+    if monthly_df.empty:
+        # Typed, so boolean filters on reading_starts keep the columns
+        return pd.DataFrame({
+            'espmid': pd.Series(dtype=object),
+            'year': pd.Series(dtype='int64'),
+            'total_kbtu': pd.Series(dtype=float),
+            'reading_starts': pd.Series(dtype=bool),
+        })
+
+    yearly = monthly_df.groupby(['espmid', 'year'], as_index=False).agg(
+        total_kbtu=('kbtu', 'sum'), readings_started=('readings_started', 'sum')
+    )
+    # Whether a reading starts in the year, not just spills into it
+    yearly['reading_starts'] = yearly.pop('readings_started') > 0
+    return yearly
+
+
+# Monthly kBTU for a set of buildings, from the rollup tables when they are enabled
+def monthly_kbtu_for(espmids):
+    if db_helper.rollup_tables_enabled():
+        return db_helper.get_monthly_kbtu_for(espmids)
+    return monthly_kbtu(calendarize(db_helper.get_meter_data_for(espmids)))
+
+
+# Monthly kBTU for every building in the portfolio, for all years or just `year`
+def portfolio_monthly_kbtu(year=None):
+    if db_helper.rollup_tables_enabled():
+        return db_helper.get_monthly_kbtu(year)
+    monthly = monthly_kbtu(calendarize(db_helper.get_portfolio_meter_rows(year)))
+    return monthly if year is None else monthly[monthly['year'] == year]
+
+
+# Latest-year EUI, baseline EUI and gap to baseline for every building at once
+def compute_eui(buildings_df, yearly_df):
+    buildings = buildings_df.assign(
+        espmid=buildings_df['espmid'].astype(str),
+        sqft=pd.to_numeric(buildings_df['sqfootage'], errors='coerce'),
+    )
+
+    # Most recent year in which a reading starts, so a December bill spilling a
+    # few days into January doesn't make January's sliver the "latest year"
+    yearly = yearly_df.assign(espmid=yearly_df['espmid'].astype(str))
+    starts = yearly[yearly['reading_starts']]
+    latest = starts[starts['year'] == starts.groupby('espmid')['year'].transform('max')]
+    latest = latest.rename(columns={'year': 'latest_year'}).drop(columns='reading_starts')
+
+    df = buildings.merge(latest, on='espmid', how='left')
+
+    # Same rule as the Building page: only buildings with positive sq ft and energy use get an EUI
+    valid = (df['sqft'] > 0) & (df['total_kbtu'] > 0)
+    df['current_eui'] = (df['total_kbtu'] / df['sqft']).where(valid)
+    df['baseline_eui'] = df['usetype'].map(baseline_eui)
+    df['eui_gap'] = df['current_eui'] - df['baseline_eui']
+    df['eui_gap_pct'] = df['eui_gap'] / df['baseline_eui'] * 100
+
+    return df[EUI_COLUMNS]
+
+
+# EUI for every building in the portfolio, calendarized, cached across sessions
+@st.cache_data(ttl=db_helper.QUERY_CACHE_TTL, show_spinner=False)
+def get_portfolio_eui():
+    from catalog import get_catalog
+
+    if db_helper.rollup_tables_enabled():
+        yearly = db_helper.get_yearly_kbtu()
+    else:
+        yearly = yearly_kbtu(monthly_kbtu(calendarize(db_helper.get_portfolio_meter_rows())))
+    return compute_eui(get_catalog().buildings, yearly)
@@ -0,0 +1,77 @@
+# figure_cache.py
+# Built Plotly figures shared by every session in the process, stored as figure
+# JSON and evicted least-recently-used once they pass a byte budget:
+#
+#   [figure_cache]
+#   max_mb = 64
+#
+# A figure is keyed by page, chart name, espmid (or None) and a data-version
+# token, so a repeat view skips both the pandas work and the figure building
+# until the data behind it changes. Old versions are never looked up again and
+# age out of the LRU.
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+import streamlit as st
+
+from instrumentation import record, timed_figure
+
+DEFAULT_MAX_MB = 64
+
+
+class FigureCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            figure_json = self.entries.get(key)
+            if figure_json is not None:
+                self.entries.move_to_end(key)
+            return figure_json
+
+    def put(self, key, figure_json):
+        if len(figure_json) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = figure_json
+            self.size += len(figure_json)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+@st.cache_resource(show_spinner=False)
+def _cache():
+    max_mb = st.secrets.get("figure_cache", {}).get("max_mb", DEFAULT_MAX_MB)
+    return FigureCache(int(max_mb * 1024 * 1024))
+
+
+# Version token for a frame of meter rows: changes when rows are added or removed
+def frame_version(df):
+    if df.empty:
+        return "empty"
+    return f"{len(df)}:{df['entryid'].max()}"
+
+
+# The figure `build()` returns, reused across sessions while `version` is unchanged
+def cached_figure(page, name, build, espmid=None, version=None):
+    key = (page, name, espmid, version)
+    with timed_figure(name):
+        figure_json = _cache().get(key)
+        if figure_json is not None:
+            record("figure_cache", "hit", 0.0)
+            # The JSON came from a figure Plotly already validated
+            return go.Figure(json.loads(figure_json), _validate=False)
+
+        record("figure_cache", "miss", 0.0)
+        fig = build()
+        _cache().put(key, fig.to_json())
+        return fig
@@ -0,0 +1,363 @@
+# ingest.py
+# Loads ENERGY STAR Portfolio Manager exports (CSV or XLSX) into ESPMFIRSTTEST,
+# the meter tables and the water table as real numbers and dates instead of text.
+#
+#   python ingest.py buildings properties.xlsx
+#   python ingest.py electric electric_meters.csv --sheet "Meter Entries"
+#   python ingest.py water water_meters.csv
+#   python ingest.py migrate              # give the existing tables typed columns (SQL Server)
+#
+# Every row is validated before anything is written. Rows that fail are written
+# to quarantine/<table>-<timestamp>.csv with a reason column, and the rest are
+# loaded in one transaction: bulk-copied into a staging table through pymssql,
+# then moved across in a single statement. Meter rows whose entryid is already in
+# the table are skipped; buildings already in ESPMFIRSTTEST are updated. Tables
+# `migrate` hasn't typed yet get the values as lossless text.
+#
+# XLSX files need openpyxl (listed in requirements.txt).
+import argparse
+import os
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import String, inspect, text
+
+import db_helper
+
+BUILDINGS_TABLE = "ESPMFIRSTTEST"
+BATCH_SIZE = 10_000  # rows per bulk copy batch
+QUARANTINE_DIR = "quarantine"
+
+# Column types the loader writes and `migrate` converts the tables to
+BUILDING_TYPES = {
+    'espmid': "VARCHAR(50)",
+    'buildingname': "NVARCHAR(255)",
+    'usetype': "NVARCHAR(255)",
+    'sqfootage': "FLOAT",
+    'address': "NVARCHAR(255)",
+    'occupancy': "FLOAT",
+    'numbuildings': "INT",
+}
+METER_TYPES = {
+    'entryid': "BIGINT",
+    'espmid': "VARCHAR(50)",
+    'meterid': "VARCHAR(50)",
+    'usage': "FLOAT",
+    'startdate': "DATE",
+    'enddate': "DATE",
+}
+
+# Portfolio Manager export headers (lower case) accepted for each column, besides the column name itself
+BUILDING_HEADERS = {
+    'espmid': ['portfolio manager id', 'property id'],
+    'buildingname': ['property name'],
+    'usetype': ['primary property type - self selected', 'largest property use type'],
+    'sqfootage': ['property gfa - self-reported (ft²)', 'gross floor area'],
+    'address': ['address 1', 'street address'],
+    'occupancy': ['occupancy (%)'],
+    'numbuildings': ['number of buildings'],
+}
+METER_HEADERS = {
+    'entryid': ['meter consumption id', 'consumption id'],
+    'espmid': ['portfolio manager id', 'property id'],
+    'meterid': ['portfolio manager meter id', 'meter id'],
+    'usage': ['usage/quantity', 'quantity'],
+    'startdate': ['start date'],
+    'enddate': ['end date'],
+}
+
+
+def _column_types(table_name):
+    return BUILDING_TYPES if table_name == BUILDINGS_TABLE else METER_TYPES
+
+
+def read_export(path, table_name, sheet=None):
+    if path.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path, sheet_name=sheet or 0, dtype=str)
+    else:
+        df = pd.read_csv(path, dtype=str)
+
+    headers = BUILDING_HEADERS if table_name == BUILDINGS_TABLE else METER_HEADERS
+    renames = {}
+    for header in df.columns:
+        name = str(header).strip().lower()
+        for column, aliases in headers.items():
+            if name == column or name in aliases:
+                renames[header] = column
+    df = df.rename(columns=renames)
+
+    missing = [column for column in _column_types(table_name) if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path} has no column for: {', '.join(missing)}")
+    return df[list(_column_types(table_name))]
+
+
+# IDs exported from Excel can come through as "1000004.0"
+def _id_text(values):
+    values = values.str.strip()
+    return values.str.replace(r"\.0+$", "", regex=True).replace("", None)
+
+
+# Typed copy of the export plus a reason for every row that can't be loaded ('' if fine)
+def validate(df, table_name):
+    reasons = pd.Series("", index=df.index)
+
+    def reject(mask, reason):
+        reasons[mask] += reason + "; "
+
+    def number(column, required=False):
+        raw = df[column].str.strip().str.replace(",", "", regex=False).replace("", None)
+        value = pd.to_numeric(raw, errors='coerce')
+        reject(raw.notna() & value.isna(), f"{column} is not a number")
+        if required:
+            reject(raw.isna(), f"{column} is missing")
+        return value
+
+    typed = pd.DataFrame(index=df.index)
+    typed['espmid'] = _id_text(df['espmid'])
+    reject(typed['espmid'].isna(), "espmid is missing")
+
+    if table_name == BUILDINGS_TABLE:
+        typed['buildingname'] = df['buildingname'].str.strip().replace("", None)
+        reject(typed['buildingname'].isna(), "buildingname is missing")
+        typed['usetype'] = df['usetype'].str.strip()
+        typed['sqfootage'] = number('sqfootage')
+        reject(typed['sqfootage'] <= 0, "sqfootage is not positive")
+        typed['address'] = df['address'].str.strip()
+        typed['occupancy'] = number('occupancy')
+        reject(~typed['occupancy'].between(0, 100) & typed['occupancy'].notna(), "occupancy is not 0-100")
+        typed['numbuildings'] = number('numbuildings')
+        reject(typed['numbuildings'] % 1 > 0, "numbuildings is not a whole number")
+        key = 'espmid'
+    else:
+        entryid = number('entryid', required=True)
+        reject(entryid % 1 > 0, "entryid is not a whole number")
+        typed['entryid'] = entryid
+        typed['meterid'] = _id_text(df['meterid'])
+        typed['usage'] = number('usage', required=True)
+        reject(typed['usage'] < 0, "usage is negative")
+        for column in ['startdate', 'enddate']:
+            raw = df[column].str.strip().replace("", None)
+            typed[column] = pd.to_datetime(raw, errors='coerce')
+            reject(typed[column].isna(), f"{column} is missing or not a date")
+        reject(typed['enddate'] < typed['startdate'], "enddate is before startdate")
+        key = 'entryid'
+
+    # A later row with the same key replaces an earlier one in the same file.
+    # Rows with no usable key are kept apart so every one of them is quarantined.
+    keyed = typed[typed[key].notna()].drop_duplicates(key, keep='last')
+    typed = pd.concat([typed[typed[key].isna()], keyed]).sort_index()
+
+    return typed[list(_column_types(table_name))], reasons[typed.index].str.rstrip("; ")
+
+
+def quarantine(df, reasons, table_name, directory=QUARANTINE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{table_name}-{datetime.now():%Y%m%d-%H%M%S}.csv")
+    df.assign(reason=reasons).to_csv(path, index=False)
+    return path
+
+
+def _staging_table(table_name):
+    return f"{table_name}_staging"
+
+
+def _create_staging(connection, table_name):
+    staging = db_helper.table(_staging_table(table_name))
+    columns = ", ".join(f"[{column}] {sql_type}" for column, sql_type in _column_types(table_name).items())
+    connection.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    connection.execute(text(f"CREATE TABLE {staging} ({columns})"))
+
+
+def _fill_staging(connection, table_name, df, batch_size):
+    df = df.astype(object).where(df.notna(), None)
+    for column, sql_type in _column_types(table_name).items():
+        if sql_type in ("INT", "BIGINT"):
+            df[column] = [int(value) if value is not None else None for value in df[column]]
+    if db_helper.is_sqlite():
+        columns = list(df.columns)
+        insert = text(
+            f"INSERT INTO {db_helper.table(_staging_table(table_name))} "
+            f"({', '.join(f'[{column}]' for column in columns)}) "
+            f"VALUES ({', '.join(f':{column}' for column in columns)})"
+        )
+        for column in ['startdate', 'enddate']:
+            if column in df:
+                df[column] = [value.strftime('%Y-%m-%d') if value is not None else None for value in df[column]]
+        for start in range(0, len(df), batch_size):
+            connection.execute(insert, df.iloc[start:start + batch_size].to_dict('records'))
+        return
+
+    for column in ['startdate', 'enddate']:
+        if column in df:
+            df[column] = [value.date() if value is not None else None for value in df[column]]
+    # Bulk copy (BCP) over the transaction's own connection
+    connection.connection.driver_connection.bulk_copy(
+        _staging_table(table_name), list(df.itertuples(index=False, name=None)), batch_size=batch_size
+    )
+
+
+# Columns of the real table still stored as text, i.e. before `migrate` has run
+def _text_columns(connection, table_name):
+    schema = None if db_helper.is_sqlite() else "dbo"
+    return {
+        column['name'] for column in inspect(connection).get_columns(table_name, schema=schema)
+        if isinstance(column['type'], String)
+    }
+
+
+# A staging column as written to the real table. Typed values going into a text
+# column are converted explicitly: SQL Server's implicit FLOAT to VARCHAR keeps
+# only 6 significant digits (1.23457e+006), style 3 keeps all 17.
+def _staged(column, sql_type, text_columns):
+    value = f"s.[{column}]"
+    if column not in text_columns or sql_type.startswith(("VARCHAR", "NVARCHAR")):
+        return value
+    if db_helper.is_sqlite():
+        return f"CAST({value} AS TEXT)"
+    if sql_type == "FLOAT":
+        return f"CONVERT(VARCHAR(50), {value}, 3)"
+    if sql_type == "DATE":
+        return f"CONVERT(VARCHAR(10), {value}, 23)"
+    return f"CAST({value} AS VARCHAR(50))"
+
+
+# Move the staging rows into the real table. Returns (inserted, updated).
+def _merge_staging(connection, table_name):
+    target = db_helper.table(table_name)
+    staging = db_helper.table(_staging_table(table_name))
+    column_types = _column_types(table_name)
+    columns = list(column_types)
+    column_list = ", ".join(f"[{column}]" for column in columns)
+    text_columns = _text_columns(connection, table_name)
+    staged = {column: _staged(column, sql_type, text_columns) for column, sql_type in column_types.items()}
+
+    updated = 0
+    if table_name == BUILDINGS_TABLE:
+        key = 'espmid'
+        assignments = ", ".join(
+            f"[{column}] = (SELECT {staged[column]} FROM {staging} s WHERE s.[espmid] = {target}.[espmid])"
+            for column in columns if column != key
+        )
+        updated = connection.execute(text(f"""
+            UPDATE {target}
+            SET {assignments}
+            WHERE [espmid] IN (SELECT [espmid] FROM {staging})
+        """)).rowcount
+    else:
+        key = 'entryid'
+
+    # The key is compared in the real table's type, so a text entryid isn't cast row by row
+    inserted = connection.execute(text(f"""
+        INSERT INTO {target} ({column_list})
+        SELECT {", ".join(staged[column] for column in columns)}
+        FROM {staging} s
+        WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.[{key}] = {staged[key]})
+    """)).rowcount
+    connection.execute(text(f"DROP TABLE {staging}"))
+    return inserted, updated
+
+
+# The first water load creates the water table, already typed and indexed
+def _create_water_table(connection):
+    target = db_helper.table(db_helper.WATER_TABLE)
+    columns = ", ".join(f"[{column}] {sql_type}" for column, sql_type in METER_TYPES.items())
+    if db_helper.is_sqlite():
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {target} ({columns})"))
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS [IX_water_espmid] ON {target} ([espmid])"))
+        connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS [IX_water_entryid] ON {target} ([entryid])"))
+        return
+    connection.execute(text(f"""
+        IF OBJECT_ID('dbo.{db_helper.WATER_TABLE}') IS NULL
+        BEGIN
+            CREATE TABLE {target} ({columns});
+            CREATE INDEX [IX_water_espmid] ON {target} ([espmid]);
+            CREATE UNIQUE INDEX [IX_water_entryid] ON {target} ([entryid]);
+        END
+    """))
+
+
+def load(df, table_name, batch_size=BATCH_SIZE):
+    engine = db_helper.get_connection().engine
+    with engine.begin() as connection:
+        if table_name == db_helper.WATER_TABLE:
+            _create_water_table(connection)
+        _create_staging(connection, table_name)
+        _fill_staging(connection, table_name, df, batch_size)
+        return _merge_staging(connection, table_name)
+
+
+def ingest(path, table_name, sheet=None, batch_size=BATCH_SIZE):
+    export = read_export(path, table_name, sheet)
+    typed, reasons = validate(export, table_name)
+    bad = reasons != ""
+    # Quarantine the rows as exported, so they can be fixed and loaded again
+    quarantined = quarantine(export.loc[typed.index[bad]], reasons[bad], table_name) if bad.any() else None
+    inserted, updated = load(typed[~bad], table_name, batch_size)
+    return {"inserted": inserted, "updated": updated, "rejected": int(bad.sum()), "quarantine": quarantined}
+
+
+# Convert the text columns of an existing table to their real types in place.
+# Refuses (and writes the offending rows to quarantine) if any value won't convert.
+def migrate(table_name):
+    if db_helper.is_sqlite():
+        raise SystemExit("migrate is for SQL Server; SQLite columns take whatever type they are given")
+
+    target = db_helper.table(table_name)
+    typed_columns = {
+        column: sql_type for column, sql_type in _column_types(table_name).items()
+        if not sql_type.startswith(("VARCHAR", "NVARCHAR"))
+    }
+    engine = db_helper.get_connection().engine
+    with engine.begin() as connection:
+        for column in typed_columns:
+            connection.execute(text(f"UPDATE {target} SET [{column}] = NULL WHERE LTRIM(RTRIM([{column}])) = ''"))
+
+        unconvertible = " OR ".join(
+            f"([{column}] IS NOT NULL AND TRY_CAST([{column}] AS {sql_type}) IS NULL)"
+            for column, sql_type in typed_columns.items()
+        )
+        bad = pd.read_sql(text(f"SELECT * FROM {target} WHERE {unconvertible}"), connection)
+        if not bad.empty:
+            path = quarantine(bad, "value does not convert", table_name)
+            raise SystemExit(f"{table_name}: {len(bad):,} rows won't convert, see {path}; fix them and rerun")
+
+        for column, sql_type in typed_columns.items():
+            connection.execute(text(f"ALTER TABLE {target} ALTER COLUMN [{column}] {sql_type} NULL"))
+
+        # Lookups by building, and entryid dedupe for the meter tables
+        connection.execute(text(
+            f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_{table_name}_espmid') "
+            f"CREATE INDEX [IX_{table_name}_espmid] ON {target} ([espmid])"
+        ))
+        if table_name != BUILDINGS_TABLE:
+            connection.execute(text(
+                f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_{table_name}_entryid') "
+                f"AND NOT EXISTS (SELECT [entryid] FROM {target} GROUP BY [entryid] HAVING COUNT(*) > 1) "
+                f"CREATE UNIQUE INDEX [IX_{table_name}_entryid] ON {target} ([entryid])"
+            ))
+
+
+if __name__ == "__main__":
+    tables = {"buildings": BUILDINGS_TABLE, **{name: name for name in [*db_helper.METER_TABLES, db_helper.WATER_TABLE]}}
+    parser = argparse.ArgumentParser(description="Load Portfolio Manager exports into the database.")
+    parser.add_argument("table", choices=[*tables, "migrate"], help="table to load, or migrate to type every table")
+    parser.add_argument("path", nargs="?", help="CSV or XLSX export")
+    parser.add_argument("--sheet", help="worksheet to read from an XLSX file (default: the first)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per bulk copy batch")
+    args = parser.parse_args()
+
+    if args.table == "migrate":
+        for table_name in tables.values():
+            if table_name == db_helper.WATER_TABLE and not db_helper.has_water_table():
+                continue
+            migrate(table_name)
+            print(f"{table_name}: typed")
+        print("Set [database] typed_columns = true in secrets.toml so reads stop casting.")
+    else:
+        if not args.path:
+            parser.error("a CSV or XLSX export is required")
+        result = ingest(args.path, tables[args.table], args.sheet, args.batch_size)
+        print(f"{result['inserted']:,} inserted, {result['updated']:,} updated, {result['rejected']:,} rejected")
+        if result["quarantine"]:
+            print(f"Rejected rows: {result['quarantine']}")
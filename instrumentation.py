@@ -0,0 +1,206 @@
+# instrumentation.py
+# Records how long each data query and chart takes on every rerun.
+#
+#   - Admins (usernames listed in [auth] admin_users) get a sidebar toggle that
+#     shows this rerun's queries and figures.
+#   - With [instrumentation] log = true, each rerun is written as one JSON log line
+#     to stderr. Fragments declared with instrumentation.fragment also log their
+#     own reruns, which only run the fragment.
+#   - With [instrumentation] metrics_port set, process-wide totals are served in
+#     Prometheus text format on that port.
+#
+# Payload bytes cost a serialization pass, so they are only measured when one of
+# the above is switched on.
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+# Streamlit doesn't configure the root logger, so rerun lines get their own handler
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_RERUN_KEY = "_instrumentation_records"
+_DEBUG_KEY = "_instrumentation_debug"
+
+
+def _settings():
+    return st.secrets.get("instrumentation", {})
+
+
+def is_admin():
+    return st.session_state.get("username") in st.secrets["auth"].get("admin_users", [])
+
+
+# False on threads without a session, e.g. warm-up and prefetch threads
+def _in_session():
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+
+def _measuring_payload():
+    return (
+        (_in_session() and st.session_state.get(_DEBUG_KEY, False))
+        or _settings().get("log", False)
+        or "metrics_port" in _settings()
+    )
+
+
+# Totals since the process started, shared by every session
+@st.cache_resource(show_spinner=False)
+def _totals():
+    return {"lock": threading.Lock(), "series": {}}
+
+
+def record(kind, name, seconds, rows=None, payload_bytes=None):
+    entry = {"kind": kind, "name": name, "seconds": seconds, "rows": rows, "payload_bytes": payload_bytes}
+    if _in_session():
+        st.session_state.setdefault(_RERUN_KEY, []).append(entry)
+
+    totals = _totals()
+    with totals["lock"]:
+        series = totals["series"].setdefault((kind, name), {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0})
+        series["count"] += 1
+        series["seconds"] += seconds
+        series["rows"] += rows or 0
+        series["bytes"] += payload_bytes or 0
+
+
+# Decorator for data access functions returning a dataframe
+def timed_query(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        df = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        payload = int(df.memory_usage(deep=True).sum()) if _measuring_payload() else None
+        record("query", func.__name__, seconds, rows=len(df), payload_bytes=payload)
+        return df
+    return wrapper
+
+
+# Times the block that builds a figure
+@contextmanager
+def timed_figure(name):
+    start = time.perf_counter()
+    yield
+    record("figure", name, time.perf_counter() - start)
+
+
+# st.plotly_chart that also records how big the figure sent to the browser is
+def plotly_chart(fig, name, **kwargs):
+    start = time.perf_counter()
+    payload = len(fig.to_json()) if _measuring_payload() else None
+    st.plotly_chart(fig, **kwargs)
+    record("render", name, time.perf_counter() - start, payload_bytes=payload)
+
+
+# Returns this rerun's record list. Keep hold of it: once a page calls st.stop(),
+# every later Streamlit call, session state included, stops the script again.
+def start_rerun():
+    records = []
+    st.session_state[_RERUN_KEY] = records
+    return records
+
+
+def _log_rerun(entry, records, completed):
+    if _settings().get("log", False):
+        logger.info(json.dumps({**entry, "completed": completed, "records": records}))
+
+
+# Log the rerun and show the admin debug sidebar. Call after the page has run,
+# also when it ended early (completed=False), which skips the sidebar.
+def finish_rerun(page_title, records, completed=True):
+    _log_rerun({"page": page_title}, records, completed)
+    if not completed or not is_admin():
+        return
+    with st.sidebar:
+        if not st.toggle("Show performance metrics", key=_DEBUG_KEY):
+            return
+        if not records:
+            st.caption("Nothing recorded on this rerun.")
+            return
+        df = pd.DataFrame(records)
+        st.metric("Rerun total (s)", f"{df['seconds'].sum():.3f}")
+        st.dataframe(
+            df.sort_values('seconds', ascending=False),
+            column_config={
+                'seconds': st.column_config.NumberColumn("Seconds", format="%.3f"),
+                'payload_bytes': st.column_config.NumberColumn("Bytes", format="%d"),
+            },
+            hide_index=True,
+        )
+
+
+# st.fragment that also times the fragment's own reruns. Those skip
+# streamlit_app.py, so they are logged here; the admin sidebar keeps showing
+# the last full rerun.
+def fragment(func):
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None or not ctx.fragment_ids_this_run:
+            return func(*args, **kwargs)
+        records = start_rerun()
+        completed = False
+        try:
+            result = func(*args, **kwargs)
+            completed = True
+            return result
+        finally:
+            _log_rerun({"fragment": func.__name__}, records, completed)
+    return st.fragment(timed)
+
+
+def prometheus_text():
+    totals = _totals()
+    with totals["lock"]:
+        series = dict(totals["series"])
+
+    lines = []
+    for metric, field, help_text in [
+        ("espm_calls_total", "count", "Number of queries, figure builds and renders"),
+        ("espm_seconds_total", "seconds", "Wall time spent"),
+        ("espm_rows_total", "rows", "Rows returned by queries"),
+        ("espm_payload_bytes_total", "bytes", "Bytes of query results and serialized figures"),
+    ]:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (kind, name), values in sorted(series.items()):
+            lines.append(f'{metric}{{kind="{kind}",name="{name}"}} {values[field]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Start the Prometheus endpoint once per process if a port is configured
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    port = _settings().get("metrics_port")
+    if port is None:
+        return None
+    server = ThreadingHTTPServer(("", int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,242 @@
+# load_test.py
+# Simulates many people using the app at once against a synthetic SQLite
+# stand-in, to find where connection pool exhaustion or pandas CPU time makes
+# it unusable.
+#
+#   python load_test.py                                  # 1, 5, 10 and 25 sessions, 1k buildings
+#   python load_test.py --sessions 10 50 --buildings 10000 --steps 30 --json load.json
+#
+# Each session is an AppTest of streamlit_app.py running on its own thread in
+# one process, as sessions do in a Streamlit server. It logs in through
+# require_login, then moves between the three pages through st.navigation,
+# searching for a random building on the Building page. Every concurrency level
+# runs in a fresh process (with a fresh connection pool and caches) and reports
+# rerun latency percentiles, time spent waiting for a pooled connection and
+# the process's memory.
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from benchmark import REPO_DIR, prepare_scale
+
+DEFAULT_SESSIONS = [1, 5, 10, 25]
+PAGES = ["Account_Details.py", "1_Portfolio_Data.py", "2_Building_Data.py"]
+BUILDING_PAGE = "2_Building_Data.py"
+RERUN_TIMEOUT = 300  # seconds a single rerun may take
+MEMORY_SAMPLE_S = 0.2
+
+
+# Time spent inside the pool waiting for (or opening) a connection
+def _install_pool_timer(waits):
+    from sqlalchemy.pool import QueuePool
+
+    do_get = QueuePool._do_get
+
+    def timed_do_get(self):
+        start = time.perf_counter()
+        try:
+            return do_get(self)
+        finally:
+            waits.append(time.perf_counter() - start)
+
+    QueuePool._do_get = timed_do_get
+
+
+# AppTest installs a mock Runtime for each run and removes it when the run ends,
+# which pulls it out from under other sessions still running: keep handing out
+# the most recent one instead. It also compiles every page on every run, where
+# a server compiles once; share one script cache, as the server does.
+def _share_runtime():
+    import streamlit.testing.v1.app_test as app_test
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = lambda: script_cache
+    latest = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest[:] = [cls._instance]
+        if not latest:
+            raise RuntimeError("Runtime hasn't been created!")
+        return latest[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(latest))
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, where /proc is missing
+
+
+def _sample_memory(samples, stop):
+    while not stop.is_set():
+        samples.append(_rss_mb())
+        stop.wait(MEMORY_SAMPLE_S)
+
+
+# One simulated person: log in, then `steps` page visits
+def _session(number, steps, espmids, think_s, seed, reruns, errors):
+    from streamlit.testing.v1 import AppTest
+    import streamlit as st
+
+    rng = random.Random(seed + number)
+    at = AppTest.from_file(os.path.join(REPO_DIR, "streamlit_app.py"), default_timeout=RERUN_TIMEOUT)
+
+    def rerun(page, action):
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as err:
+            errors.append(f"session {number} {page}: {type(err).__name__}: {err}")
+            return False
+        reruns.append({"page": page, "seconds": time.perf_counter() - start})
+        if at.exception:
+            errors.append(f"session {number} {page}: {at.exception[0].message}")
+            return False
+        return True
+
+    auth = st.secrets["auth"]
+    if not rerun("login", at.run):
+        return
+
+    def log_in():
+        at.text_input[0].input(auth["username"])
+        at.text_input[1].input(auth["password"])
+        at.button[0].click().run()
+
+    if not rerun("login", log_in):
+        return
+
+    for _ in range(steps):
+        time.sleep(rng.uniform(0, think_s))
+        page = rng.choice(PAGES)
+        if not rerun(page, lambda: at.switch_page(page).run()):
+            continue
+        if page == BUILDING_PAGE:
+            espmid = rng.choice(espmids)
+            rerun(page, lambda: at.text_input[0].input(espmid).run())
+
+
+def _percentiles(values):
+    import numpy as np
+
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "max": max(values)}
+
+
+# Runs inside the per-level process, with the working directory holding secrets.toml
+def run_worker(n_sessions, steps, think_s, seed):
+    sys.path.insert(0, REPO_DIR)
+    import db_helper
+
+    waits, reruns, errors, memory = [], [], [], []
+    _install_pool_timer(waits)
+    _share_runtime()
+    espmids = db_helper.get_buildings()['espmid'].astype(str).tolist()
+
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sample_memory, args=(memory, stop), daemon=True)
+    sampler.start()
+    start_mb = _rss_mb()
+
+    start = time.perf_counter()
+    sessions = [
+        threading.Thread(target=_session, args=(i, steps, espmids, think_s, seed, reruns, errors))
+        for i in range(n_sessions)
+    ]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+
+    print(json.dumps({
+        "sessions": n_sessions,
+        "reruns": len(reruns),
+        "reruns_per_s": len(reruns) / elapsed,
+        "latency_s": _percentiles([r["seconds"] for r in reruns]),
+        "latency_by_page_s": {
+            page: _percentiles([r["seconds"] for r in reruns if r["page"] == page]) for page in PAGES
+        },
+        "pool_wait_s": _percentiles(waits),
+        "checkouts": len(waits),
+        "start_mb": start_mb,
+        "peak_mb": max(memory, default=start_mb),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+    }))
+
+
+def run_level(scale_dir, n_sessions, steps, think_s, seed):
+    print(f"Running {n_sessions:,} concurrent sessions...", file=sys.stderr)
+    worker = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker",
+         "--sessions", str(n_sessions), "--steps", str(steps), "--think", str(think_s), "--seed", str(seed)],
+        cwd=scale_dir, capture_output=True, text=True,
+    )
+    if worker.returncode != 0:
+        raise RuntimeError(f"Load test worker failed at {n_sessions:,} sessions:\n{worker.stderr[-2000:]}")
+    return json.loads(worker.stdout.strip().splitlines()[-1])
+
+
+def print_report(results):
+    header = (f"{'sessions':>8} {'reruns':>7} {'reruns/s':>9} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'max s':>7} "
+              f"{'pool p95 s':>11} {'pool max s':>11} {'peak MB':>8} {'errors':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        latency, wait = r["latency_s"], r["pool_wait_s"]
+        if latency["p50"] is None:
+            print(f"{r['sessions']:>8,} {r['reruns']:>7,} {'no completed reruns':>40} {r['errors']:>7,}")
+            continue
+        print(f"{r['sessions']:>8,} {r['reruns']:>7,} {r['reruns_per_s']:>9.2f} {latency['p50']:>7.2f} "
+              f"{latency['p95']:>7.2f} {latency['p99']:>7.2f} {latency['max']:>7.2f} "
+              f"{wait['p95'] or 0:>11.3f} {wait['max'] or 0:>11.3f} {r['peak_mb']:>8.0f} {r['errors']:>7,}")
+    for r in results:
+        for error in r["first_errors"]:
+            print(f"  {r['sessions']} sessions: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the app with concurrent simulated sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS, help="concurrency levels to test")
+    parser.add_argument("--steps", type=int, default=20, help="page visits per session after logging in")
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds a session pauses between visits")
+    parser.add_argument("--buildings", type=int, default=1_000, help="buildings in the synthetic database")
+    parser.add_argument("--years", type=int, default=3, help="years of monthly bills per meter")
+    parser.add_argument("--seed", type=int, default=2030, help="seed for the pages and buildings sessions pick")
+    parser.add_argument("--workdir", default=".bench", help="where databases and per-scale secrets are kept")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the database if it already exists")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.sessions[0], args.steps, args.think, args.seed)
+        sys.exit()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    scale_dir = prepare_scale(args.buildings, args.years, args.workdir, args.regenerate)
+    results = [run_level(scale_dir, n, args.steps, args.think, args.seed) for n in args.sessions]
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,93 @@
+# meter_store.py
+# One compact copy of each building's meter rows, shared by every session and
+# evicted least-recently-used once the store passes a memory budget:
+#
+#   [meter_store]
+#   max_mb = 256
+#
+# Rows are kept with categorical energy_type and meterid, float32 usage and
+# datetime64 dates (formatted only when displayed), sorted by energy type so
+# each fuel's rows are a slice of the same frame rather than a copy. Entries
+# are keyed by espmid and the meter data version, so new bills replace them
+# and old versions age out. Frames are shared: filter or copy them, never
+# modify them in place.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import db_helper
+from instrumentation import record
+from rollups import data_version
+
+DEFAULT_MAX_MB = 256
+
+
+class MeterStore:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[2]
+            self.entries[key] = (*entry, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[2]
+
+
+@st.cache_resource(show_spinner=False)
+def _store():
+    max_mb = st.secrets.get("meter_store", {}).get("max_mb", DEFAULT_MAX_MB)
+    return MeterStore(int(max_mb * 1024 * 1024))
+
+
+# Meter rows in the dtypes the store keeps, sorted by energy type then date
+def compact_meter_rows(df):
+    df = df.assign(
+        energy_type=pd.Categorical(df['energy_type'], categories=list(db_helper.METER_TABLES.values())),
+        meterid=df['meterid'].astype('category'),
+        usage=df['usage'].astype(np.float32),
+        year=pd.to_numeric(df['year'], downcast='integer'),
+    )
+    return df.sort_values(['energy_type', 'startdate'], ignore_index=True)
+
+
+# Each energy type's rows as a slice of the sorted frame
+def _split(df):
+    bounds = np.searchsorted(df['energy_type'].cat.codes.to_numpy(), np.arange(len(db_helper.METER_TABLES) + 1))
+    return {
+        energy_type: df.iloc[bounds[i]:bounds[i + 1]]
+        for i, energy_type in enumerate(db_helper.METER_TABLES.values())
+    }
+
+
+# A building's meter rows and the same rows split by energy type
+def get_meter_frames(espmid):
+    key = (str(espmid), data_version())
+    entry = _store().get(key)
+    if entry is not None:
+        record("meter_store", "hit", 0.0)
+        return entry[0], entry[1]
+
+    record("meter_store", "miss", 0.0)
+    df = compact_meter_rows(db_helper.get_meter_data(espmid))
+    frames = _split(df)
+    _store().put(key, (df, frames), int(df.memory_usage(deep=True).sum()))
+    return df, frames
@@ -0,0 +1,207 @@
+# report_cli.py
+# Writes a standalone HTML scorecard for every building, plus a portfolio summary
+# linking to them, using the same EUI and chart code as the Building page.
+#
+#   python report_cli.py --out reports
+#   python report_cli.py --out reports/2024 --year 2024 --workers 8
+#
+# Meter data for the whole portfolio is read in one query up front; the worker
+# processes only build figures and HTML. Reports already in the output folder
+# are skipped, so an interrupted run picks up where it stopped (--force redoes
+# them). plotly.min.js is written once next to the reports, so the folder works
+# offline as long as it is shared whole.
+import argparse
+import html
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import plotly.offline
+
+import db_helper
+from calendarize import calendarize
+from catalog import BuildingCatalog
+from charts import METER_CHARTS, eui_comparison_bar, stepped_meter_chart
+from eui import compute_eui, monthly_kbtu, yearly_kbtu
+
+PAGE_STYLE = """
+body { font-family: sans-serif; margin: 2em auto; max-width: 1100px; color: #222; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 4px 10px; text-align: left; }
+td.number { text-align: right; }
+.above { color: #b00; }
+.below { color: #070; }
+"""
+
+
+def _page(title, body):
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<script src="plotly.min.js"></script><style>{PAGE_STYLE}</style></head>
+<body>{body}</body></html>
+"""
+
+
+def _figure_html(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def report_filename(espmid):
+    return f"building-{espmid}.html"
+
+
+# Build one building's scorecard. Runs in a worker process.
+def render_building(out_dir, building, eui, meter_rows, yearly):
+    name = html.escape(str(building['buildingname']))
+    rows = [
+        ("Address", building['address']),
+        ("Use Type", building['usetype']),
+        ("Square Footage", f"{building['sqft']:,.0f}" if pd.notna(building['sqft']) else None),
+        ("ESPM ID", building['espmid']),
+    ]
+    body = [f"<h1>{name}</h1>", "<table>"]
+    body += [
+        f"<tr><th>{label}</th><td>{html.escape(str(value)) if pd.notna(value) else 'Not Available'}</td></tr>"
+        for label, value in rows
+    ]
+    body.append("</table>")
+
+    # Same EUI rules and chart as the Building page
+    if pd.notna(eui['current_eui']):
+        latest_year = int(eui['latest_year'])
+        body.append(f"<h2>Energy Use Intensity, {latest_year}</h2>")
+        if pd.notna(eui['baseline_eui']):
+            body.append(_figure_html(eui_comparison_bar(eui['current_eui'], eui['baseline_eui'], latest_year)))
+            css_class, word = ("above", "higher") if eui['eui_gap'] > 0 else ("below", "lower")
+            body.append(
+                f"<p class='{css_class}'>Current EUI is <b>{abs(eui['eui_gap']):.1f} kBTU/sq ft {word}</b> "
+                f"than baseline ({eui['eui_gap_pct']:+.1f}%)</p>"
+            )
+        else:
+            body.append(f"<p>Current EUI: <b>{eui['current_eui']:.1f} kBTU/sq ft</b>. "
+                        "No baseline EUI available for this building type.</p>")
+    else:
+        body.append("<p>Not enough data to calculate EUI.</p>")
+
+    if not yearly.empty:
+        body.append("<h2>Net Energy Use by Year</h2><table><tr><th>Year</th><th>kBTU</th></tr>")
+        body += [
+            f"<tr><td>{int(row.year)}</td><td class='number'>{row.total_kbtu:,.0f}</td></tr>"
+            for row in yearly.sort_values('year').itertuples()
+        ]
+        body.append("</table>")
+
+    for energy_type, _, title, yaxis_title, trace_name in METER_CHARTS:
+        fuel_rows = meter_rows[meter_rows['energy_type'] == energy_type]
+        if not fuel_rows.empty:
+            body.append(_figure_html(stepped_meter_chart(fuel_rows, title, yaxis_title, trace_name)))
+    if meter_rows.empty:
+        body.append("<p>No meter data found for this building.</p>")
+
+    # Written under a temporary name first, so a killed run never leaves a half file behind
+    path = os.path.join(out_dir, report_filename(building['espmid']))
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(_page(str(building['buildingname']), "\n".join(body)))
+    os.replace(path + ".tmp", path)
+    return building['espmid']
+
+
+def write_summary(out_dir, eui_df, year):
+    ranked = eui_df.sort_values('eui_gap', ascending=False, na_position='last')
+    with_eui = ranked.dropna(subset=['current_eui'])
+    title = f"Portfolio Scorecard{f' {year}' if year else ''}"
+    body = [
+        f"<h1>{title}</h1>",
+        f"<p>{len(eui_df):,} buildings, {len(with_eui):,} with an EUI, "
+        f"{(with_eui['eui_gap'] > 0).sum():,} above their baseline.</p>",
+        "<table><tr><th>Building</th><th>Use Type</th><th>Year</th><th>EUI</th>"
+        "<th>Baseline EUI</th><th>Gap (%)</th></tr>",
+    ]
+    for row in ranked.itertuples():
+        link = f"<a href='{report_filename(row.espmid)}'>{html.escape(str(row.buildingname))}</a>"
+        cells = [
+            html.escape(str(row.usetype)) if pd.notna(row.usetype) else "",
+            f"{int(row.latest_year)}" if pd.notna(row.latest_year) else "",
+            f"{row.current_eui:.1f}" if pd.notna(row.current_eui) else "",
+            f"{row.baseline_eui:.1f}" if pd.notna(row.baseline_eui) else "",
+            f"{row.eui_gap_pct:+.1f}" if pd.notna(row.eui_gap_pct) else "",
+        ]
+        css_class = " class='above'" if pd.notna(row.eui_gap) and row.eui_gap > 0 else ""
+        body.append(f"<tr{css_class}><td>{link}</td>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+    body.append("</table>")
+
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(_page(title, "\n".join(body)))
+
+
+def generate(out_dir, year=None, workers=None, force=False):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "plotly.min.js"), "w", encoding="utf-8") as f:
+        f.write(plotly.offline.get_plotlyjs())
+
+    # Everything the reports need, read once
+    buildings = BuildingCatalog(db_helper.get_buildings()).buildings
+    meter_rows = db_helper.get_portfolio_meter_rows()
+    yearly = yearly_kbtu(monthly_kbtu(calendarize(meter_rows)))
+    if year:
+        yearly = yearly[yearly['year'] <= year]
+        meter_rows = meter_rows[meter_rows['startdate'].dt.year <= year]
+    eui_df = compute_eui(buildings, yearly)
+
+    todo = buildings
+    if not force:
+        done = {
+            filename[len("building-"):-len(".html")]
+            for filename in os.listdir(out_dir)
+            if filename.startswith("building-") and filename.endswith(".html")
+        }
+        todo = buildings[~buildings['espmid'].isin(done)]
+    print(f"{len(todo):,} of {len(buildings):,} reports to write", file=sys.stderr)
+
+    meters_by_building = dict(tuple(meter_rows.groupby('espmid')))
+    yearly_by_building = dict(tuple(yearly.groupby('espmid')))
+    eui_by_building = eui_df.set_index('espmid')
+    empty_meters = meter_rows.iloc[:0]
+    empty_yearly = yearly.iloc[:0]
+
+    start = time.perf_counter()
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                render_building,
+                out_dir,
+                building,
+                eui_by_building.loc[building['espmid']].to_dict(),
+                meters_by_building.get(building['espmid'], empty_meters),
+                yearly_by_building.get(building['espmid'], empty_yearly),
+            ): building['espmid']
+            for building in todo.to_dict('records')
+        }
+        for done_count, future in enumerate(as_completed(futures), 1):
+            try:
+                future.result()
+            except Exception as err:
+                failed.append(futures[future])
+                print(f"Building {futures[future]} failed: {err}", file=sys.stderr)
+            if done_count % 50 == 0 or done_count == len(futures):
+                print(f"{done_count:,}/{len(futures):,} in {time.perf_counter() - start:.0f}s", file=sys.stderr)
+
+    write_summary(out_dir, eui_df, year)
+    return len(todo) - len(failed), failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write HTML scorecards for every building.")
+    parser.add_argument("--out", default="reports", help="output folder")
+    parser.add_argument("--year", type=int, help="report EUI as of this year (default: each building's latest)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="rewrite reports that already exist")
+    args = parser.parse_args()
+
+    written, failed = generate(args.out, args.year, args.workers, args.force)
+    print(f"Wrote {written:,} reports and {os.path.join(args.out, 'index.html')}")
+    if failed:
+        sys.exit(f"{len(failed):,} reports failed; rerun to retry them")
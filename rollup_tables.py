@@ -0,0 +1,219 @@
+# rollup_tables.py
+# Rollup tables kept next to the raw meter tables, so the pages read a few
+# thousand pre-summed rows instead of summing raw readings on every view:
+#
+#   building_dim       one typed row per espmid (square footage as a number)
+#   meter_monthly      calendarized net kBTU per espmid, energy type and month
+#   rollup_watermark   highest entryid already rolled up, per meter table
+#
+# Run it on a schedule, or after loading new bills:
+#   python rollup_tables.py             # create the tables if needed, roll up new entryids
+#   python rollup_tables.py --rebuild   # recompute everything
+#
+# and point the pages at the rollups in secrets.toml:
+#
+#   [rollup_tables]
+#   enabled = true
+#
+# Only readings with an entryid above the watermark are picked up, and for the
+# buildings they belong to only the months they touch are recomputed. Readings
+# edited or deleted in place don't move the watermark; run --rebuild after those.
+import argparse
+import json
+
+import pandas as pd
+from sqlalchemy import text
+
+import db_helper
+from calendarize import calendarize
+from eui import monthly_kbtu
+
+BATCH_BUILDINGS = 2000  # buildings recomputed per round-trip
+
+TABLES = {
+    "building_dim": """
+        [espmid] VARCHAR(50) NOT NULL PRIMARY KEY,
+        [buildingname] NVARCHAR(255) NULL,
+        [usetype] NVARCHAR(255) NULL,
+        [sqft] FLOAT NULL,
+        [address] NVARCHAR(255) NULL
+    """,
+    "meter_monthly": """
+        [espmid] VARCHAR(50) NOT NULL,
+        [energy_type] VARCHAR(20) NOT NULL,
+        [month] DATE NOT NULL,
+        [kbtu] FLOAT NOT NULL,
+        [readings_started] INT NOT NULL,
+        PRIMARY KEY ([espmid], [energy_type], [month])
+    """,
+    "rollup_watermark": """
+        [table_name] VARCHAR(50) NOT NULL PRIMARY KEY,
+        [max_entryid] BIGINT NOT NULL
+    """,
+}
+
+
+def create_tables(connection):
+    for table_name, columns in TABLES.items():
+        if db_helper.is_sqlite():
+            connection.execute(text(f"CREATE TABLE IF NOT EXISTS {db_helper.table(table_name)} ({columns})"))
+        else:
+            connection.execute(text(
+                f"IF OBJECT_ID('dbo.{table_name}') IS NULL CREATE TABLE {db_helper.table(table_name)} ({columns})"
+            ))
+
+
+# The building table is small, so its typed copy is rebuilt in full every run
+def refresh_building_dim(connection):
+    connection.execute(text(f"DELETE FROM {db_helper.table('building_dim')}"))
+    result = connection.execute(text(f"""
+        INSERT INTO {db_helper.table('building_dim')} ([espmid], [buildingname], [usetype], [sqft], [address])
+        SELECT [espmid], [buildingname], [usetype], [sqft], [address]
+        FROM (
+            SELECT
+                CAST([espmid] AS VARCHAR(50)) as espmid,
+                [buildingname],
+                [usetype],
+                {db_helper.to_float('[sqfootage]')} as sqft,
+                [address],
+                ROW_NUMBER() OVER (PARTITION BY [espmid] ORDER BY [buildingname]) as duplicate_number
+            FROM {db_helper.table('ESPMFIRSTTEST')}
+            WHERE [espmid] IS NOT NULL
+        ) b
+        WHERE duplicate_number = 1
+    """))
+    return result.rowcount
+
+
+def _watermark(connection, table_name):
+    value = connection.execute(
+        text(f"SELECT [max_entryid] FROM {db_helper.table('rollup_watermark')} WHERE [table_name] = :table_name"),
+        {"table_name": table_name},
+    ).scalar()
+    return value or 0
+
+
+def _set_watermark(connection, table_name, max_entryid):
+    params = {"table_name": table_name, "max_entryid": int(max_entryid)}
+    updated = connection.execute(text(f"""
+        UPDATE {db_helper.table('rollup_watermark')}
+        SET [max_entryid] = :max_entryid
+        WHERE [table_name] = :table_name
+    """), params)
+    if updated.rowcount == 0:
+        connection.execute(text(f"""
+            INSERT INTO {db_helper.table('rollup_watermark')} ([table_name], [max_entryid])
+            VALUES (:table_name, :max_entryid)
+        """), params)
+
+
+# Recompute meter_monthly for some buildings over [first_month, last_month]
+def _recompute(connection, table_name, espmids, first_month, last_month):
+    energy_type = db_helper.METER_TABLES[table_name]
+    range_end = last_month + pd.offsets.MonthBegin(1)
+    raw = pd.read_sql(text(f"""
+        SELECT
+            CAST([espmid] AS VARCHAR(50)) as espmid,
+            {db_helper.to_float('[usage]')} as usage,
+            [startdate],
+            [enddate]
+        FROM {db_helper.meter_table(table_name)}
+        WHERE {db_helper.in_json_list('[espmid]', 'espmids')}
+        AND [startdate] < :range_end
+        AND [enddate] >= :first_month
+    """), connection, params={
+        "espmids": json.dumps(espmids),
+        "first_month": first_month.strftime('%Y-%m-%d'),
+        "range_end": range_end.strftime('%Y-%m-%d'),
+    })
+    raw['startdate'] = pd.to_datetime(raw['startdate'])
+    raw['enddate'] = pd.to_datetime(raw['enddate'])
+
+    monthly = monthly_kbtu(calendarize(raw.dropna(subset=['usage']).assign(energy_type=energy_type)))
+    monthly = monthly[monthly['month'].between(first_month, last_month)]
+
+    connection.execute(text(f"""
+        DELETE FROM {db_helper.table('meter_monthly')}
+        WHERE [energy_type] = :energy_type
+        AND {db_helper.in_json_list('[espmid]', 'espmids')}
+        AND [month] >= :first_month
+        AND [month] <= :last_month
+    """), {
+        "energy_type": energy_type,
+        "espmids": json.dumps(espmids),
+        "first_month": first_month.strftime('%Y-%m-%d'),
+        "last_month": last_month.strftime('%Y-%m-%d'),
+    })
+    if not monthly.empty:
+        connection.execute(text(f"""
+            INSERT INTO {db_helper.table('meter_monthly')} ([espmid], [energy_type], [month], [kbtu], [readings_started])
+            VALUES (:espmid, :energy_type, :month, :kbtu, :readings_started)
+        """), [
+            {
+                "espmid": row.espmid,
+                "energy_type": row.energy_type,
+                "month": row.month.strftime('%Y-%m-%d'),
+                "kbtu": float(row.kbtu),
+                "readings_started": int(row.readings_started),
+            }
+            for row in monthly.itertuples()
+        ])
+    return len(monthly)
+
+
+# Roll up one meter table's readings above the watermark. Returns rows written.
+def refresh_meter_table(connection, table_name, rebuild=False):
+    if rebuild:
+        connection.execute(
+            text(f"DELETE FROM {db_helper.table('meter_monthly')} WHERE [energy_type] = :energy_type"),
+            {"energy_type": db_helper.METER_TABLES[table_name]},
+        )
+    watermark = 0 if rebuild else _watermark(connection, table_name)
+
+    new_rows = pd.read_sql(text(f"""
+        SELECT
+            CAST([espmid] AS VARCHAR(50)) as espmid,
+            {db_helper.to_bigint('[entryid]')} as entryid,
+            [startdate],
+            [enddate]
+        FROM {db_helper.meter_table(table_name)}
+        WHERE {db_helper.to_bigint('[entryid]')} > :watermark
+        AND [espmid] IS NOT NULL
+    """), connection, params={"watermark": watermark})
+    if new_rows.empty:
+        return 0
+    new_rows['startdate'] = pd.to_datetime(new_rows['startdate'])
+    new_rows['enddate'] = pd.to_datetime(new_rows['enddate'])
+
+    # Months each building's new readings touch
+    touched = calendarize(new_rows.assign(usage=0.0)).groupby('espmid')['month'].agg(['min', 'max'])
+
+    written = 0
+    for start in range(0, len(touched), BATCH_BUILDINGS):
+        batch = touched.iloc[start:start + BATCH_BUILDINGS]
+        written += _recompute(connection, table_name, batch.index.tolist(), batch['min'].min(), batch['max'].max())
+
+    _set_watermark(connection, table_name, new_rows['entryid'].max())
+    return written
+
+
+# Bring every rollup table up to date. Each table commits on its own, together
+# with its watermark, so an interrupted run picks up where it stopped.
+def refresh(rebuild=False):
+    engine = db_helper.get_connection().engine
+    with engine.begin() as connection:
+        create_tables(connection)
+        counts = {"building_dim": refresh_building_dim(connection)}
+    for table_name in db_helper.METER_TABLES:
+        with engine.begin() as connection:
+            counts[table_name] = refresh_meter_table(connection, table_name, rebuild)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and refresh the meter rollup tables.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every month instead of only new entryids")
+    args = parser.parse_args()
+
+    for table_name, rows in refresh(args.rebuild).items():
+        print(f"{table_name}: {rows:,} rows written")
@@ -0,0 +1,83 @@
+# rollups.py
+# Per-year rollups of the meter data. Each year's result is cached under a
+# version token built from that year's meter rows, so adding data for the
+# current year only recomputes the current year.
+import pandas as pd
+import streamlit as st
+
+import db_helper
+from catalog import get_catalog
+
+VERSION_TTL = 300  # seconds between checks for new meter rows
+
+# name -> (function computing one year's rollup, whether it depends on earlier years,
+#          function returning {year: version} for its source data, or None for the meter tables)
+ROLLUPS = {}
+
+
+def rollup(name, depends_on_earlier_years=False, versions=None):
+    def register(compute_year):
+        ROLLUPS[name] = (compute_year, depends_on_earlier_years, versions)
+        return compute_year
+    return register
+
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def year_versions():
+    return db_helper.get_year_versions()
+
+
+# One token covering every year's meter data, for caches keyed on all of it
+def data_version():
+    return "|".join(f"{year}={version}" for year, version in sorted(year_versions().items()))
+
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def _rollup_year(name, year, version):
+    compute_year, _, _ = ROLLUPS[name]
+    return compute_year(year).assign(year=year)
+
+
+# One row per year from the named rollup, recomputing only years whose data changed
+def get_rollup(name):
+    _, depends_on_earlier_years, source_versions = ROLLUPS[name]
+    versions = (source_versions or year_versions)()
+    years = sorted(versions)
+
+    frames = []
+    for i, year in enumerate(years):
+        if depends_on_earlier_years:
+            version = "|".join(versions[y] for y in years[:i + 1])
+        else:
+            version = versions[year]
+        frames.append(_rollup_year(name, year, version))
+
+    if not frames:
+        return pd.DataFrame(columns=['year'])
+    return pd.concat(frames, ignore_index=True)
+
+
+# Buildings that joined the program in a year, taking a building's first meter
+# reading as the year it joined. Only espmids are cached: square footage is
+# joined from the catalog when read, so corrections show up without new meter rows.
+@rollup("enrollment", depends_on_earlier_years=True)
+def _enrollment_year(year):
+    return pd.DataFrame({'espmid': db_helper.get_first_year_buildings(year)['espmid'].astype(str)})
+
+
+# Cumulative buildings and square footage in the program by year
+def get_enrollment_by_year():
+    years = sorted(year_versions())
+    if not years:
+        return pd.DataFrame(columns=['years', 'buildings', 'square_footage'])
+
+    df = get_rollup("enrollment").reindex(columns=['espmid', 'year'])
+    df['sqft'] = df['espmid'].map(get_catalog().buildings.set_index('espmid')['sqft'])
+    new = df.groupby('year').agg(
+        new_buildings=('espmid', 'size'), new_square_footage=('sqft', 'sum')
+    ).reindex(years, fill_value=0)
+    return pd.DataFrame({
+        'years': new.index,
+        'buildings': new['new_buildings'].cumsum().to_numpy(),
+        'square_footage': new['new_square_footage'].cumsum().to_numpy(),
+    })
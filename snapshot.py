@@ -0,0 +1,271 @@
+# snapshot.py
+# Optional local mirror of ESPMFIRSTTEST and the meter tables as Arrow IPC files.
+#
+# Enable it in secrets.toml:
+#
+#   [snapshot]
+#   enabled = true
+#   dir = ".snapshot"          # where the files are kept
+#   refresh_minutes = 60       # how often the app pulls new meter rows
+#
+# Meter tables are refreshed incrementally: only rows with an entryid above the
+# stored watermark are fetched and written as a new part file. Files are
+# uncompressed Arrow IPC, so reads are memory-mapped and zero-copy until rows are
+# filtered down and converted to pandas.
+#
+# Refresh from the command line (e.g. on a schedule):
+#   python snapshot.py
+# Write the snapshot out as a SQLite stand-in for [connections.sql]:
+#   python snapshot.py --to-sqlite standin.db
+import argparse
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+import db_helper
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # snapshot support is optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = ".snapshot"
+DEFAULT_REFRESH_MINUTES = 60
+MAX_PARTS = 20  # compact a table into one file once it has this many parts
+
+BUILDINGS_TABLE = "ESPMFIRSTTEST"
+METER_SNAPSHOT_COLUMNS = ['espmid', 'entryid', 'meterid', 'usage', 'startdate', 'enddate']
+
+
+def _settings():
+    return st.secrets.get("snapshot", {})
+
+
+def is_enabled():
+    return pa is not None and bool(_settings().get("enabled", False))
+
+
+def snapshot_dir():
+    return _settings().get("dir", DEFAULT_DIR)
+
+
+def _manifest_path(base):
+    return os.path.join(base, "manifest.json")
+
+
+def load_manifest(base=None):
+    path = _manifest_path(base or snapshot_dir())
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(base, manifest):
+    tmp_path = _manifest_path(base) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(base))
+
+
+def _write_part(base, table_name, df, part_number):
+    table_dir = os.path.join(base, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f"part-{part_number:05d}.arrow")
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    return os.path.basename(path)
+
+
+def _read_arrow(base, table_name, parts):
+    tables = []
+    for part in parts:
+        source = pa.memory_map(os.path.join(base, table_name, part), "r")
+        tables.append(pa.ipc.open_file(source).read_all())
+    return pa.concat_tables(tables, promote_options="default") if tables else None
+
+
+# Rows of one meter table newer than the watermark, typed once on the way in
+def _fetch_meter_rows(table_name, watermark):
+    entryid = db_helper.to_bigint('[entryid]')
+    df = db_helper.read_sql(f"""
+        SELECT
+            CAST([espmid] AS VARCHAR(50)) as espmid,
+            {entryid} as entryid,
+            CAST([meterid] AS VARCHAR(50)) as meterid,
+            {db_helper.to_float('[usage]')} as usage,
+            [startdate],
+            [enddate]
+        FROM {db_helper.meter_table(table_name)}
+        WHERE {entryid} > :watermark
+        ORDER BY {entryid}
+    """, params={"watermark": watermark})
+    df['startdate'] = pd.to_datetime(df['startdate'])
+    df['enddate'] = pd.to_datetime(df['enddate'])
+    return df[METER_SNAPSHOT_COLUMNS]
+
+
+# Pull new rows from the database into the snapshot. Returns rows added per table.
+def refresh(base=None):
+    base = base or snapshot_dir()
+    os.makedirs(base, exist_ok=True)
+    manifest = load_manifest(base)
+    added = {}
+    stale = []  # (table, part) files removed once the new manifest is saved
+
+    # The building table is small, so it is replaced in full
+    buildings = db_helper.read_sql(f"SELECT * FROM {db_helper.table(BUILDINGS_TABLE)}")
+    buildings['espmid'] = buildings['espmid'].astype(str)
+    old_parts = manifest.get(BUILDINGS_TABLE, {}).get("parts", [])
+    version = manifest.get(BUILDINGS_TABLE, {}).get("version", 0) + 1
+    part = _write_part(base, BUILDINGS_TABLE, buildings, version)
+    manifest[BUILDINGS_TABLE] = {"parts": [part], "rows": len(buildings), "version": version}
+    stale += [(BUILDINGS_TABLE, old_part) for old_part in old_parts if old_part != part]
+    added[BUILDINGS_TABLE] = len(buildings)
+
+    for table_name in db_helper.METER_TABLES:
+        entry = manifest.get(table_name, {"parts": [], "rows": 0, "watermark": 0, "version": 0})
+        new_rows = _fetch_meter_rows(table_name, entry["watermark"])
+        added[table_name] = len(new_rows)
+        if new_rows.empty:
+            continue
+
+        entry["version"] += 1
+        entry["parts"].append(_write_part(base, table_name, new_rows, entry["version"]))
+        entry["rows"] += len(new_rows)
+        entry["watermark"] = int(new_rows['entryid'].max())
+
+        if len(entry["parts"]) > MAX_PARTS:
+            combined = _read_arrow(base, table_name, entry["parts"]).to_pandas()
+            entry["version"] += 1
+            old_parts, entry["parts"] = entry["parts"], [_write_part(base, table_name, combined, entry["version"])]
+            stale += [(table_name, old_part) for old_part in old_parts]
+
+        manifest[table_name] = entry
+
+    manifest["refreshed_at"] = datetime.now().isoformat(timespec="seconds")
+    _save_manifest(base, manifest)
+    # Sessions may still be reading the parts the old manifest listed until now
+    for table_name, part in stale:
+        os.remove(os.path.join(base, table_name, part))
+    return added
+
+
+@st.cache_resource(show_spinner=False)
+def _refresh_state():
+    return {"last_refresh": None, "lock": threading.Lock()}
+
+
+def _refresh_and_release(base, state):
+    try:
+        refresh(base)
+    except Exception as e:
+        logger.warning("Snapshot refresh failed, serving existing snapshot: %s", e)
+    finally:
+        state["last_refresh"] = datetime.now()
+        state["lock"].release()
+
+
+# Refresh at most once per refresh_minutes for the whole process, on a background
+# thread: sessions keep reading the existing snapshot while new rows are pulled,
+# and if the database is unreachable they never wait on the connect timeout. Only
+# the very first refresh, when there is no snapshot to serve yet, runs inline.
+def _refresh_if_due(base, manifest):
+    state = _refresh_state()
+    interval = timedelta(minutes=_settings().get("refresh_minutes", DEFAULT_REFRESH_MINUTES))
+    last_refresh = state["last_refresh"]
+    if last_refresh is not None and datetime.now() - last_refresh < interval:
+        return
+    if not manifest:
+        state["lock"].acquire()
+        if load_manifest(base):  # another session built it while we waited
+            state["lock"].release()
+        else:
+            _refresh_and_release(base, state)
+        return
+    if not state["lock"].acquire(blocking=False):
+        return
+    threading.Thread(target=_refresh_and_release, args=(base, state), name="snapshot-refresh", daemon=True).start()
+
+
+def _current_manifest():
+    base = snapshot_dir()
+    manifest = load_manifest(base)
+    _refresh_if_due(base, manifest)
+    return base, manifest or load_manifest(base)
+
+
+# Memory-mapped Arrow tables, shared by all sessions until a part is added
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _arrow_table(base, table_name, parts):
+    return _read_arrow(base, table_name, list(parts))
+
+
+def read_table(table_name):
+    base, manifest = _current_manifest()
+    parts = tuple(manifest.get(table_name, {}).get("parts", []))
+    arrow_table = _arrow_table(base, table_name, parts)
+    if arrow_table is None:
+        raise FileNotFoundError(f"No snapshot of {table_name} in {base}. Run `python snapshot.py` first.")
+    return arrow_table.to_pandas()
+
+
+# Meter rows from every meter table, optionally for one building only. The filter
+# runs on the memory-mapped Arrow data so only matching rows are materialized.
+def meter_rows(espmid=None, espmids=None):
+    base, manifest = _current_manifest()
+    frames = []
+    for table_name, energy_type in db_helper.METER_TABLES.items():
+        parts = tuple(manifest.get(table_name, {}).get("parts", []))
+        arrow_table = _arrow_table(base, table_name, parts)
+        if arrow_table is None:
+            continue
+        if espmid is not None:
+            arrow_table = arrow_table.filter(pc.equal(arrow_table["espmid"], espmid))
+        if espmids is not None:
+            arrow_table = arrow_table.filter(pc.is_in(arrow_table["espmid"], pa.array(list(espmids), pa.string())))
+        frames.append(arrow_table.to_pandas().assign(energy_type=energy_type))
+
+    if not frames:
+        return pd.DataFrame(columns=METER_SNAPSHOT_COLUMNS + ['energy_type'])
+    return pd.concat(frames, ignore_index=True).sort_values('startdate', ignore_index=True)
+
+
+# Write the snapshot tables into a SQLite file the app can use as [connections.sql]
+def to_sqlite(path, base=None):
+    import sqlite3
+
+    base = base or snapshot_dir()
+    manifest = load_manifest(base)
+    with sqlite3.connect(path) as sqlite_conn:
+        for table_name in [BUILDINGS_TABLE, *db_helper.METER_TABLES]:
+            arrow_table = _read_arrow(base, table_name, manifest.get(table_name, {}).get("parts", []))
+            if arrow_table is not None:
+                arrow_table.to_pandas().to_sql(table_name, sqlite_conn, if_exists="replace", index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the local ESPM snapshot.")
+    parser.add_argument("--dir", default=None, help="snapshot directory (default: secrets or .snapshot)")
+    parser.add_argument("--to-sqlite", metavar="PATH", help="write the snapshot to a SQLite file and exit")
+    args = parser.parse_args()
+
+    if pa is None:
+        raise SystemExit("pyarrow is required for snapshots: pip install pyarrow")
+    base = args.dir or snapshot_dir()
+    if args.to_sqlite:
+        to_sqlite(args.to_sqlite, base)
+        print(f"Wrote {args.to_sqlite}")
+    else:
+        for table_name, rows in refresh(base).items():
+            print(f"{table_name}: {rows:,} rows")
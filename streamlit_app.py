@@ -1,4 +1,6 @@
 import streamlit as st
+import instrumentation
+import warmup
 
 home = st.Page("Account_Details.py", title="Account Details")
 page1 = st.Page("1_Portfolio_Data.py", title="Portfolio Data")
@@ -6,4 +8,13 @@ page2 = st.Page("2_Building_Data.py", title="Building Data")
 
 pg = st.navigation([home, page1, page2])
 
-pg.run()
+instrumentation.start_metrics_server()
+warmup.start_warmup()
+records = instrumentation.start_rerun()
+# Pages that end in st.stop() (or st.rerun()) are still logged
+completed = False
+try:
+    pg.run()
+    completed = True
+finally:
+    instrumentation.finish_rerun(pg.title, records, completed)
@@ -0,0 +1,38 @@
+# test_eui.py
+import pandas as pd
+
+import db_helper
+from calendarize import calendarize
+from eui import compute_eui, monthly_kbtu, yearly_kbtu
+
+BUILDING = {'espmid': '1000000', 'buildingname': "Office 1000000", 'usetype': "Office",
+            'sqfootage': '10000', 'address': "1 Main St"}
+
+
+def building_eui(meter_rows):
+    monthly = monthly_kbtu(calendarize(meter_rows.assign(espmid=BUILDING['espmid'])))
+    return compute_eui(pd.DataFrame([BUILDING]), yearly_kbtu(monthly)).iloc[0]
+
+
+# An enrolled building with no bills yet gets no EUI, but still its baseline
+def test_building_with_no_readings():
+    eui = building_eui(pd.DataFrame(columns=db_helper.METER_COLUMNS))
+    assert pd.isna(eui['current_eui'])
+    assert pd.isna(eui['latest_year'])
+    assert eui['baseline_eui'] == 80
+
+
+def test_building_with_a_year_of_readings():
+    months = pd.date_range("2024-01-01", periods=13, freq="MS")
+    rows = pd.DataFrame({
+        'entryid': range(12),
+        'meterid': "m1",
+        'usage': 1000.0,
+        'startdate': months[:-1],
+        'enddate': months[1:],
+        'energy_type': "Natural Gas",
+        'year': 2024,
+    })
+    eui = building_eui(rows)
+    assert eui['latest_year'] == 2024
+    assert eui['current_eui'] == 12 * 1000 * 100 / 10000
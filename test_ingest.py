@@ -0,0 +1,41 @@
+# test_ingest.py
+from ingest import BUILDINGS_TABLE, read_export, validate
+
+METER_EXPORT = """Meter Consumption ID,Portfolio Manager ID,Portfolio Manager Meter ID,Usage/Quantity,Start Date,End Date
+1,1000000,m1,100,2024-01-01,2024-01-31
+,1000000,m1,110,2024-02-01,2024-02-29
+,1000000,m1,120,2024-03-01,2024-03-31
+x,1000000,m1,130,2024-04-01,2024-04-30
+2,1000000,m1,140,2024-05-01,2024-05-31
+2,1000000,m1,150,2024-05-01,2024-05-31
+"""
+
+BUILDING_EXPORT = """Portfolio Manager ID,Property Name,Largest Property Use Type,Gross Floor Area,Address 1,Occupancy (%),Number of Buildings
+1000000,Office 1000000,Office,10000,1 Main St,100,1
+,Office A,Office,20000,2 Main St,100,1
+,Office B,Office,30000,3 Main St,100,1
+"""
+
+
+def validated(tmp_path, table_name, export):
+    path = tmp_path / "export.csv"
+    path.write_text(export)
+    return validate(read_export(str(path), table_name), table_name)
+
+
+# Every row without a usable entryid is quarantined, not collapsed into one
+def test_meter_rows_with_bad_entryids_are_all_quarantined(tmp_path):
+    typed, reasons = validated(tmp_path, "electric", METER_EXPORT)
+    bad = reasons != ""
+    assert bad.sum() == 3
+    assert list(reasons[bad]) == ["entryid is missing", "entryid is missing", "entryid is not a number"]
+    # The later row with entryid 2 replaces the earlier one
+    good = typed[~bad]
+    assert list(good['entryid']) == [1, 2]
+    assert list(good['usage']) == [100, 150]
+
+
+def test_buildings_without_espmid_are_all_quarantined(tmp_path):
+    typed, reasons = validated(tmp_path, BUILDINGS_TABLE, BUILDING_EXPORT)
+    assert list(reasons != "") == [False, True, True]
+    assert list(typed['buildingname']) == ["Office 1000000", "Office A", "Office B"]
@@ -0,0 +1,125 @@
+# trends.py
+# District energy and water use intensity by year, for the Portfolio page's
+# trend charts, computed from the meter tables and the water table.
+#
+# Each year's per-building totals (kBTU or gallons, and months with readings)
+# are a per-year rollup (see rollups.py), so new bills only re-aggregate the
+# years they fall in. The district figures are square-foot weighted: buildings
+# with a full year of readings and a square footage are summed, then divided
+# by their combined square footage.
+#
+#   - EUI baseline: each building's use-type baseline EUI (eui.baseline_eui), the
+#     same benchmark the Building page compares a building's EUI against
+#   - WUI baseline: each building's first full year of water use. There is no
+#     use-type water benchmark to look up, so water is measured against the
+#     building's own starting point, as emissions.py does for carbon
+#   - Target: TARGET_FACTOR of the baseline, for both
+import pandas as pd
+import streamlit as st
+
+import db_helper
+from calendarize import calendarize
+from catalog import get_catalog
+from eui import baseline_eui, portfolio_monthly_kbtu
+from rollups import VERSION_TTL, data_version, get_rollup, rollup
+
+# Target intensity as a share of the baseline. 0.68 is the ratio every year of the
+# Portfolio page's original hand-typed EUI and WUI series used (EUI 64.3 of 94.5,
+# WUI 35.36 of 52 in their first year); it is not the 2030 goal of half the
+# baseline that emissions.TARGET_REDUCTION applies.
+TARGET_FACTOR = 0.68
+
+TREND_COLUMNS = ['years', 'baseline', 'actual', 'target']
+BUILDING_WATER_COLUMNS = ['espmid', 'year', 'use', 'months', 'sqft', 'wui']
+
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def water_year_versions():
+    return db_helper.get_water_year_versions()
+
+
+# One token covering every year's water data, like rollups.data_version()
+def water_data_version():
+    return "|".join(f"{year}={version}" for year, version in sorted(water_year_versions().items()))
+
+
+@rollup("energy_use")
+def _energy_year(year):
+    monthly = portfolio_monthly_kbtu(year)
+    return monthly.groupby('espmid', as_index=False).agg(use=('kbtu', 'sum'), months=('month', 'nunique'))
+
+
+@rollup("water_use", versions=water_year_versions)
+def _water_year(year):
+    monthly = calendarize(db_helper.get_portfolio_water_rows(year))
+    monthly = monthly[monthly['year'] == year]
+    return monthly.groupby('espmid', as_index=False).agg(use=('usage', 'sum'), months=('month', 'nunique'))
+
+
+# Sq-ft-weighted baseline, actual and target per year from per-building rows
+# with year, use, baseline_use and sqft
+def district_trend(df):
+    totals = df.groupby('year')[['use', 'baseline_use', 'sqft']].sum()
+    baseline = totals['baseline_use'] / totals['sqft']
+    return pd.DataFrame({
+        'years': totals.index,
+        'baseline': baseline.to_numpy(),
+        'actual': (totals['use'] / totals['sqft']).to_numpy(),
+        'target': (baseline * TARGET_FACTOR).to_numpy(),
+    })
+
+
+# Buildings with a full year of readings and a square footage, with their use type
+def _full_years(name):
+    df = get_rollup(name)
+    if 'espmid' not in df.columns:
+        return None
+    df = df.merge(get_catalog().buildings[['espmid', 'sqft', 'usetype']], on='espmid')
+    return df[(df['months'] == 12) & (df['sqft'] > 0)]
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _eui_trend(version, catalog_version):
+    df = _full_years("energy_use")
+    if df is None:
+        return pd.DataFrame(columns=TREND_COLUMNS)
+
+    df = df.assign(baseline_use=df['usetype'].map(baseline_eui) * df['sqft']).dropna(subset=['baseline_use'])
+    return district_trend(df)
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _wui_trend(version, catalog_version):
+    df = _full_years("water_use")
+    if df is None:
+        return pd.DataFrame(columns=TREND_COLUMNS)
+
+    first = df.loc[df.groupby('espmid')['year'].idxmin(), ['espmid', 'use']]
+    df = df.merge(first.rename(columns={'use': 'baseline_use'}), on='espmid')
+    return district_trend(df)
+
+
+# District EUI (kBTU/sq ft) by year
+def get_eui_trend():
+    return _eui_trend(data_version(), get_catalog().version)
+
+
+# District WUI (gal/sq ft) by year; empty until the water table has data
+def get_wui_trend():
+    return _wui_trend(water_data_version(), get_catalog().version)
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _building_water(version, catalog_version):
+    df = get_rollup("water_use")
+    if 'espmid' not in df.columns:
+        return pd.DataFrame(columns=BUILDING_WATER_COLUMNS)
+
+    df = df.merge(get_catalog().buildings[['espmid', 'sqft']], on='espmid', how='left')
+    df['wui'] = (df['use'] / df['sqft']).where(df['sqft'] > 0)
+    return df.sort_values(['espmid', 'year'], ignore_index=True)[BUILDING_WATER_COLUMNS]
+
+
+# Gallons, months with readings and WUI per building and year
+def get_building_water():
+    return _building_water(water_data_version(), get_catalog().version)
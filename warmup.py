@@ -0,0 +1,111 @@
+# warmup.py
+# Fills the shared caches in the background, so the first visitor after a
+# deploy or restart doesn't wait on the portfolio queries, and the buildings a
+# user is likely to open next are already in the meter store.
+#
+#   - start_warmup() runs once per process from streamlit_app.py and loads the
+#     building catalog and the Portfolio page's aggregates on a daemon thread.
+#   - prefetch_buildings() loads meter rows for the selector neighbours and
+#     same-use-type buildings of the one being viewed, on a small thread pool.
+#
+# Both only call the same cached functions the pages do, so a page that gets
+# there first simply computes the value itself and the warm-up reuses it.
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from catalog import get_catalog
+from data_quality import get_issues
+from db_helper import get_usetype_summary
+from emissions import get_district_emissions
+from eui import get_portfolio_eui
+from meter_store import get_meter_frames
+from rollups import data_version, get_enrollment_by_year
+from trends import get_eui_trend, get_wui_trend
+from weather import get_weather_normalized_eui
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_WORKERS = 2     # kept small so prefetching never ties up the connection pool
+PREFETCH_NEIGHBOURS = 2  # buildings either side of the selected one in the selector
+PREFETCH_SAME_USETYPE = 4
+
+WARMUP_STEPS = [
+    ("building catalog", get_catalog),
+    ("use type summary", get_usetype_summary),
+    ("meter data version", data_version),
+    ("enrollment by year", get_enrollment_by_year),
+    ("portfolio EUI", get_portfolio_eui),
+    ("district emissions", get_district_emissions),
+    ("EUI by year", get_eui_trend),
+    ("WUI by year", get_wui_trend),
+    ("weather-normalized EUI", get_weather_normalized_eui),
+    ("data quality issues", get_issues),
+]
+
+
+def _warm():
+    for name, load in WARMUP_STEPS:
+        try:
+            load()
+        except Exception:
+            logger.exception("Warm-up step failed: %s", name)
+    logger.info("Warm-up finished")
+
+
+# Start the warm-up once per process
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    thread = threading.Thread(target=_warm, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def _prefetch_pool():
+    return {"executor": ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="prefetch"),
+            "pending": set(), "lock": threading.Lock()}
+
+
+def _prefetch(espmid):
+    pool = _prefetch_pool()
+    try:
+        get_meter_frames(espmid)
+    except Exception:
+        logger.exception("Prefetch failed for building %s", espmid)
+    finally:
+        with pool["lock"]:
+            pool["pending"].discard(espmid)
+
+
+# Buildings likely to be picked after `espmid`: its neighbours in the selector,
+# then others of the same use type
+def likely_next(espmid, selector_espmids):
+    espmid = str(espmid)
+    selector_espmids = [str(e) for e in selector_espmids]
+    candidates = []
+    if espmid in selector_espmids:
+        i = selector_espmids.index(espmid)
+        candidates += selector_espmids[i + 1:i + 1 + PREFETCH_NEIGHBOURS]
+        candidates += selector_espmids[max(i - PREFETCH_NEIGHBOURS, 0):i]
+
+    building = get_catalog().get(espmid)
+    same = get_catalog().usetype_group(building['usetype']) if building else []
+    if espmid in same:
+        i = same.index(espmid)
+        candidates += (same[i + 1:] + same[:i])[:PREFETCH_SAME_USETYPE]
+
+    return [e for e in dict.fromkeys(candidates) if e != espmid]
+
+
+# Load meter rows for the likely next buildings without blocking the page
+def prefetch_buildings(espmid, selector_espmids):
+    pool = _prefetch_pool()
+    for next_espmid in likely_next(espmid, selector_espmids):
+        with pool["lock"]:
+            if next_espmid in pool["pending"]:
+                continue
+            pool["pending"].add(next_espmid)
+        pool["executor"].submit(_prefetch, next_espmid)
@@ -0,0 +1,119 @@
+# weather.py
+# Weather-normalized EUI from a local heating/cooling degree-day file, so no
+# network is needed:
+#
+#   [weather]
+#   degree_days = "degree_days.csv"   # columns: month (YYYY-MM), hdd, cdd
+#
+# Each building's monthly net kBTU is fit as
+#
+#   kbtu = base * days + heating * HDD + cooling * CDD
+#
+# for the whole portfolio at once: the normal equations of every building are
+# summed in one groupby and solved as a stack of 3x3 systems. A year's
+# normalized kBTU swaps its degree days for the average complete year in the
+# file. Fits are cached until new meter data arrives or the file changes.
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from eui import get_portfolio_eui, portfolio_monthly_kbtu
+from rollups import data_version
+
+MIN_MONTHS = 12  # months overlapping the degree-day file needed to fit a building
+
+TERMS = ['days', 'hdd', 'cdd']
+COEFFICIENT_COLUMNS = ['espmid', 'kbtu_per_day', 'kbtu_per_hdd', 'kbtu_per_cdd', 'months', 'r2']
+
+
+def degree_days_path():
+    return st.secrets.get("weather", {}).get("degree_days")
+
+
+def load_degree_days(path):
+    df = pd.read_csv(path)
+    df.columns = [column.strip().lower() for column in df.columns]
+    return pd.DataFrame({
+        'month': pd.to_datetime(df['month']).dt.to_period('M').dt.to_timestamp(),
+        'hdd': pd.to_numeric(df['hdd'], errors='coerce'),
+        'cdd': pd.to_numeric(df['cdd'], errors='coerce'),
+    }).dropna().drop_duplicates('month', keep='last')
+
+
+# Degree days per complete calendar year in the file
+def annual_degree_days(degree_days):
+    annual = degree_days.groupby(degree_days['month'].dt.year).agg(
+        hdd=('hdd', 'sum'), cdd=('cdd', 'sum'), months=('month', 'size')
+    )
+    return annual[annual['months'] == 12][['hdd', 'cdd']]
+
+
+# Per-building regression coefficients from monthly kBTU rows (see eui.monthly_kbtu)
+def fit_coefficients(monthly_df, degree_days):
+    totals = monthly_df.groupby(['espmid', 'month'], as_index=False)['kbtu'].sum()
+    df = totals.merge(degree_days, on='month')
+    df['days'] = df['month'].dt.days_in_month.astype(float)
+    df['months'] = df.groupby('espmid')['month'].transform('size')
+    df = df[df['months'] >= MIN_MONTHS]
+    if df.empty:
+        return pd.DataFrame(columns=COEFFICIENT_COLUMNS)
+
+    # X'X and X'y for every building, summed in one pass
+    products = {f"{a}*{b}": df[a] * df[b] for a in TERMS for b in TERMS + ['kbtu']}
+    sums = pd.DataFrame(products).groupby(df['espmid']).sum()
+    xtx = sums[[f"{a}*{b}" for a in TERMS for b in TERMS]].to_numpy().reshape(-1, 3, 3)
+    xty = sums[[f"{a}*kbtu" for a in TERMS]].to_numpy()[..., None]
+    # pinv rather than solve: a building with no cooling months has a singular X'X
+    coefficients = (np.linalg.pinv(xtx, rcond=1e-10) @ xty)[..., 0]
+
+    fit = pd.DataFrame(coefficients, index=sums.index, columns=['kbtu_per_day', 'kbtu_per_hdd', 'kbtu_per_cdd'])
+    by_row = fit.reindex(df['espmid']).to_numpy()
+    residuals = df['kbtu'] - (df[TERMS].to_numpy() * by_row).sum(axis=1)
+    deviations = df['kbtu'] - df.groupby('espmid')['kbtu'].transform('mean')
+    fit['months'] = df.groupby('espmid').size()
+    fit['r2'] = 1 - (residuals ** 2).groupby(df['espmid']).sum() / (deviations ** 2).groupby(df['espmid']).sum()
+    return fit.reset_index()[COEFFICIENT_COLUMNS]
+
+
+# EUI rows (see eui.compute_eui) with each building's latest year normalized to
+# the average weather year
+def weather_normalized_eui(eui_df, coefficients, degree_days):
+    annual = annual_degree_days(degree_days)
+    df = eui_df.merge(coefficients, on='espmid', how='left')
+    hdd = df['latest_year'].map(annual['hdd'])
+    cdd = df['latest_year'].map(annual['cdd'])
+
+    # A negative slope is noise, not a building that uses less heat when it's colder
+    heating = df['kbtu_per_hdd'].clip(lower=0)
+    cooling = df['kbtu_per_cdd'].clip(lower=0)
+    normalized_kbtu = (
+        df['total_kbtu']
+        - heating * (hdd - annual['hdd'].mean())
+        - cooling * (cdd - annual['cdd'].mean())
+    )
+    df['normalized_eui'] = (normalized_kbtu / df['sqft']).where(df['current_eui'].notna())
+    df['normalized_gap_pct'] = (df['normalized_eui'] - df['baseline_eui']) / df['baseline_eui'] * 100
+    return df[['espmid', 'normalized_eui', 'normalized_gap_pct', 'months', 'r2']]
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _degree_days(path, modified):
+    return load_degree_days(path)
+
+
+# Keyed on the meter data version and the file's modification time
+@st.cache_data(max_entries=4, show_spinner="Fitting weather regressions...")
+def get_coefficients(version, path, modified):
+    return fit_coefficients(portfolio_monthly_kbtu(), _degree_days(path, modified))
+
+
+# Weather-normalized EUI for every building, or None without a degree-day file
+def get_weather_normalized_eui():
+    path = degree_days_path()
+    if not path or not os.path.exists(path):
+        return None
+    modified = os.path.getmtime(path)
+    coefficients = get_coefficients(data_version(), path, modified)
+    return weather_normalized_eui(get_portfolio_eui(), coefficients, _degree_days(path, modified))